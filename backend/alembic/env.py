@@ -79,7 +79,8 @@ config = context.config
 
 # ✅ FIX: Convert asyncpg URL to psycopg2 for migrations
 # Alembic needs synchronous connection, but app uses async
-sync_db_url = settings.DATABASE_URL.replace(
+# Migrations bypass PgBouncer when a direct URL is configured
+sync_db_url = (settings.DATABASE_MIGRATION_URL or settings.DATABASE_URL).replace(
     "postgresql+asyncpg://", 
     "postgresql+psycopg2://"
 ).replace(
@@ -0,0 +1,70 @@
+"""add unread counters and last message denormalization
+
+Revision ID: 003_inbox_counters
+Revises: add_password_reset_002
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '003_inbox_counters'
+down_revision = 'add_password_reset_002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Per-member unread counter
+    op.add_column(
+        'conversation_members',
+        sa.Column('unread_count', sa.Integer(), nullable=False, server_default='0')
+    )
+
+    # Last message on the conversation row
+    op.add_column('conversations', sa.Column('last_message_id', postgresql.UUID(as_uuid=True), nullable=True))
+    op.add_column('conversations', sa.Column('last_message_preview', sa.String(length=255), nullable=True))
+    op.add_column('conversations', sa.Column('last_message_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_foreign_key(
+        'fk_conversations_last_message_id',
+        'conversations', 'messages',
+        ['last_message_id'], ['id'],
+        ondelete='SET NULL'
+    )
+
+    # Backfill last message
+    op.execute("""
+        UPDATE conversations c
+        SET last_message_id = m.id,
+            last_message_preview = left(m.text, 255),
+            last_message_at = m.created_at
+        FROM (
+            SELECT DISTINCT ON (conversation_id) id, conversation_id, text, created_at
+            FROM messages
+            ORDER BY conversation_id, created_at DESC, id DESC
+        ) m
+        WHERE m.conversation_id = c.id
+    """)
+
+    # Backfill unread counts (same rule the inbox used to compute on the fly)
+    op.execute("""
+        UPDATE conversation_members cm
+        SET unread_count = (
+            SELECT count(*)
+            FROM messages m
+            LEFT JOIN messages lr ON lr.id = cm.last_read_message_id
+            WHERE m.conversation_id = cm.conversation_id
+              AND m.sender_id != cm.user_id
+              AND (cm.last_read_message_id IS NULL OR m.created_at > lr.created_at)
+        )
+    """)
+
+
+def downgrade() -> None:
+    op.drop_constraint('fk_conversations_last_message_id', 'conversations', type_='foreignkey')
+    op.drop_column('conversations', 'last_message_at')
+    op.drop_column('conversations', 'last_message_preview')
+    op.drop_column('conversations', 'last_message_id')
+    op.drop_column('conversation_members', 'unread_count')
@@ -0,0 +1,36 @@
+"""add composite index for keyset message pagination
+
+Revision ID: 004_message_keyset_index
+Revises: 003_inbox_counters
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '004_message_keyset_index'
+down_revision = '003_inbox_counters'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Built concurrently so large messages tables stay writable
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_message_conversation_created_id',
+            'messages',
+            ['conversation_id', 'created_at', 'id'],
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'idx_message_conversation_created_id',
+            table_name='messages',
+            postgresql_concurrently=True,
+            if_exists=True
+        )
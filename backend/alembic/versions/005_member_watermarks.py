@@ -0,0 +1,88 @@
+"""add delivered/read watermarks to conversation members
+
+Revision ID: 005_member_watermarks
+Revises: 004_message_keyset_index
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '005_member_watermarks'
+down_revision = '004_message_keyset_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # (created_at, id) of the newest delivered / read message per member
+    op.add_column('conversation_members', sa.Column('last_read_message_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('conversation_members', sa.Column('last_delivered_message_id', postgresql.UUID(as_uuid=True), nullable=True))
+    op.add_column('conversation_members', sa.Column('last_delivered_message_at', sa.DateTime(timezone=True), nullable=True))
+
+    # Position of the existing read pointers
+    op.execute("""
+        UPDATE conversation_members cm
+        SET last_read_message_at = m.created_at
+        FROM messages m
+        WHERE m.id = cm.last_read_message_id
+    """)
+
+    # Newest read receipt per member, where it is ahead of the read pointer
+    op.execute("""
+        UPDATE conversation_members cm
+        SET last_read_message_id = r.message_id,
+            last_read_message_at = r.created_at,
+            last_read_at = coalesce(r.read_at, cm.last_read_at)
+        FROM (
+            SELECT DISTINCT ON (m.conversation_id, mr.user_id)
+                m.conversation_id, mr.user_id, m.id AS message_id, m.created_at, mr.read_at
+            FROM message_receipts mr
+            JOIN messages m ON m.id = mr.message_id::uuid
+            WHERE lower(mr.status::text) = 'read'
+            ORDER BY m.conversation_id, mr.user_id, m.created_at DESC, m.id DESC
+        ) r
+        WHERE r.conversation_id = cm.conversation_id
+          AND r.user_id = cm.user_id
+          AND (
+              cm.last_read_message_at IS NULL
+              OR (cm.last_read_message_at, cm.last_read_message_id) < (r.created_at, r.message_id)
+          )
+    """)
+
+    # Newest delivered (or read) receipt per member
+    op.execute("""
+        UPDATE conversation_members cm
+        SET last_delivered_message_id = d.message_id,
+            last_delivered_message_at = d.created_at
+        FROM (
+            SELECT DISTINCT ON (m.conversation_id, mr.user_id)
+                m.conversation_id, mr.user_id, m.id AS message_id, m.created_at
+            FROM message_receipts mr
+            JOIN messages m ON m.id = mr.message_id::uuid
+            WHERE lower(mr.status::text) IN ('delivered', 'read')
+            ORDER BY m.conversation_id, mr.user_id, m.created_at DESC, m.id DESC
+        ) d
+        WHERE d.conversation_id = cm.conversation_id
+          AND d.user_id = cm.user_id
+    """)
+
+    # Anything read was delivered
+    op.execute("""
+        UPDATE conversation_members
+        SET last_delivered_message_id = last_read_message_id,
+            last_delivered_message_at = last_read_message_at
+        WHERE last_read_message_at IS NOT NULL
+          AND (
+              last_delivered_message_at IS NULL
+              OR (last_delivered_message_at, last_delivered_message_id) < (last_read_message_at, last_read_message_id)
+          )
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('conversation_members', 'last_delivered_message_at')
+    op.drop_column('conversation_members', 'last_delivered_message_id')
+    op.drop_column('conversation_members', 'last_read_message_at')
@@ -1,14 +1,15 @@
 # backend/app/api/dependencies.py
 
+import uuid
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from jose import JWTError, jwt
+from jose import JWTError
 
 from app.db.session import get_db
 from app.models.user import User
-from app.config.settings import settings
+from app.core.security import verify_token
+from app.core.user_cache import user_cache
 
 # HTTP Bearer token scheme
 security = HTTPBearer()
@@ -21,6 +22,10 @@ async def get_current_user(
     """
     Dependency to get current authenticated user from JWT token
     
+    Verified tokens and the user's id/username/avatar/active flag are both
+    cached, so a warm request needs neither a signature check nor a query.
+    The returned User is a detached instance holding only those fields.
+    
     Usage in routes:
         @router.get("/protected")
         async def protected_route(current_user: User = Depends(get_current_user)):
@@ -36,42 +41,34 @@ async def get_current_user(
         # Extract token from credentials
         token = credentials.credentials
 
-        # Decode JWT token
-        payload = jwt.decode(
-            token,
-            settings.JWT_SECRET_KEY,
-            algorithms=[settings.JWT_ALGORITHM]
-        )
+        # Decode JWT token (cached once verified)
+        payload = verify_token(token)
 
         # Get user ID from token payload
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            print("❌ JWT Error: No 'sub' in token payload")
-            raise credentials_exception
+        user_id = uuid.UUID(payload.get("sub"))
 
     except JWTError as e:
         print(f"❌ JWT Error: {e}")
         raise credentials_exception
     except Exception as e:
-        print(f"❌ Unexpected error decoding JWT: {e}")
+        print(f"❌ Invalid 'sub' in token payload: {e}")
         raise credentials_exception
 
-    # Query user from database
+    # Resolve user from the cache, falling back to the database
     try:
-        stmt = select(User).where(User.id == user_id)
-        result = await db.execute(stmt)
-        user = result.scalar_one_or_none()
-
-        if user is None:
-            print(f"❌ User not found: {user_id}")
-            raise credentials_exception
-
-        return user
-
+        user = await user_cache.get(db, user_id)
     except Exception as e:
         print(f"❌ Database error fetching user: {e}")
         raise credentials_exception
 
+    if user is None:
+        print(f"❌ User not found: {user_id}")
+        raise credentials_exception
+    if not user.is_active:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Inactive user")
+
+    return User(id=user.id, username=user.username, avatar=user.avatar, is_active=user.is_active)
+
 
 # Optional: Dependency for admin-only routes
 async def get_current_admin_user(
@@ -1,6 +1,6 @@
 # backend/app/api/v1/auth.py - FIXED LOGGING VERSION
 
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 import os
 
@@ -10,7 +10,9 @@ from app.schemas.auth import Token, ForgotPasswordRequest, VerifyResetTokenReque
 from app.schemas.response import APIResponse
 from app.services.auth_service import AuthService
 from app.services.email_service import email_service
+from app.services.email_queue import email_queue
 from app.utils.deps import get_current_user
+from app.core.rate_limit import login_rate_limit, forgot_password_rate_limit, register_rate_limit
 from app.models.user import User
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
@@ -18,7 +20,12 @@ router = APIRouter(prefix="/auth", tags=["Auth"])
 # ============================================
 # REGISTRATION
 # ============================================
-@router.post("/register", response_model=APIResponse[UserResponse], status_code=201)
+@router.post(
+    "/register",
+    response_model=APIResponse[UserResponse],
+    status_code=201,
+    dependencies=[Depends(register_rate_limit)]
+)
 async def register(payload: UserCreate, db: AsyncSession = Depends(get_db)):
     """Register a new user"""
     user = await AuthService.register_user(db, payload)
@@ -31,7 +38,7 @@ async def register(payload: UserCreate, db: AsyncSession = Depends(get_db)):
 # ============================================
 # LOGIN (✅ Username OR Email)
 # ============================================
-@router.post("/login", response_model=APIResponse[Token])
+@router.post("/login", response_model=APIResponse[Token], dependencies=[Depends(login_rate_limit)])
 async def login(payload: UserLogin, db: AsyncSession = Depends(get_db)):
     """
     ✅ UPDATED: Login with username OR email
@@ -60,10 +67,13 @@ async def me(current_user: User = Depends(get_current_user)):
 # ============================================
 # ✅ NEW: FORGOT PASSWORD
 # ============================================
-@router.post("/forgot-password", response_model=APIResponse[dict])
+@router.post(
+    "/forgot-password",
+    response_model=APIResponse[dict],
+    dependencies=[Depends(forgot_password_rate_limit)]
+)
 async def forgot_password(
     payload: ForgotPasswordRequest,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -89,12 +99,10 @@ async def forgot_password(
             print(f"⏰ Expires: {user.reset_token_expires}")
             print(f"{'='*100}\n")
             
-            # Send email in background
-            background_tasks.add_task(
-                email_service.send_password_reset_email,
+            # Queue the email; the email worker sends it
+            await email_queue.enqueue(
                 user.email,
-                user.username,
-                reset_link
+                **email_service.password_reset_email(user.username, reset_link)
             )
         else:
             print(f"⚠️ Password reset requested for non-existent user: {payload.identifier}")
@@ -2,10 +2,10 @@
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_, func
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, and_, or_, func, tuple_
 from typing import List, Optional
 from uuid import UUID
+import base64
 
 from app.db.session import get_db
 from app.models.user import User
@@ -16,6 +16,9 @@ from app.models.conversation_member import ConversationMember
 
 from app.models.message import Message
 from app.api.dependencies import get_current_user
+from app.services.chat_service import ChatService
+from app.websocket.membership import membership
+from app.websocket.presence import presence
 from pydantic import BaseModel
 from datetime import datetime, timezone
 
@@ -28,6 +31,10 @@ class CreateConversationRequest(BaseModel):
     title: Optional[str] = None
     participant_ids: List[str]
 
+
+class OnlineUsersRequest(BaseModel):
+    user_ids: List[str]
+
 @router.get("/conversations")
 async def get_conversations(
     current_user: User = Depends(get_current_user),
@@ -35,115 +42,33 @@ async def get_conversations(
 ):
     """Get all conversations for the current user"""
     try:
-        # Get conversations where user is a member
-        stmt = (
-            select(Conversation)
-            .join(ConversationMember)
-            .where(ConversationMember.user_id == current_user.id)
-            .options(selectinload(Conversation.members))
-            .order_by(Conversation.updated_at.desc())
-        )
-        
-        result = await db.execute(stmt)
-        conversations = result.scalars().all()
+        # ✅ Whole inbox in one round trip (see ChatService.get_inbox)
+        rows = await ChatService.get_inbox(db, current_user.id)
+
+        # ✅ One presence lookup for every DM peer in the inbox
+        me = str(current_user.id)
+        peer_ids = {
+            str(row.Conversation.id): next((str(uid) for uid in (row.member_ids or []) if str(uid) != me), None)
+            for row in rows
+            if row.Conversation.kind == "dm"
+        }
+        online_ids = await presence.online_among(uid for uid in peer_ids.values() if uid)
 
         # Build response
         response_data = []
-        for conv in conversations:
-            # ✅ Get all member IDs (just IDs, not full objects)
-            members_stmt = select(ConversationMember.user_id).where(
-                ConversationMember.conversation_id == conv.id
-            )
-            members_result = await db.execute(members_stmt)
-            member_ids = [str(uid) for uid in members_result.scalars().all()]
-
-            # Get last message
-            msg_stmt = (
-                select(Message)
-                .where(Message.conversation_id == conv.id)
-                .order_by(Message.created_at.desc())
-                .limit(1)
-            )
-            msg_result = await db.execute(msg_stmt)
-            last_message = msg_result.scalar_one_or_none()
-
-            # ✅ ADD DETAILED DEBUG LOGGING
-            print(f"\n{'='*60}")
-            print(f"📊 Processing conversation: {conv.id}")
-            print(f"   Name/Title: {conv.title if conv.kind == 'group' else 'DM'}")
-
-            # ✅ CALCULATE REAL UNREAD COUNT
-            # Get user's last_read_message_id from conversation_members
-            member_stmt = select(ConversationMember).where(
-                ConversationMember.conversation_id == conv.id,
-                ConversationMember.user_id == current_user.id
-            )
-            member_result = await db.execute(member_stmt)
-            member = member_result.scalar_one_or_none()
-
-            if member:
-                print(f"   User's last_read_message_id: {member.last_read_message_id}")
-            else:
-                print(f"   ⚠️ User is not a member!")
-            
-            # Count total messages
-            total_msg_stmt = select(func.count(Message.id)).where(
-                Message.conversation_id == conv.id
-            )
-            total_result = await db.execute(total_msg_stmt)
-            total_messages = total_result.scalar() or 0
-            print(f"   Total messages: {total_messages}")
-
-            unread_count = 0
-
-            if member:
-                if member.last_read_message_id:
-                    # Count messages after last_read_message_id
-                    last_read_msg_stmt = select(Message).where(
-                        Message.id == member.last_read_message_id
-                    )
-                    last_read_result = await db.execute(last_read_msg_stmt)
-                    last_read_msg = last_read_result.scalar_one_or_none()
-                    
-                    if last_read_msg:
-                        # Count messages created after last read message
-                        unread_stmt = select(func.count(Message.id)).where(
-                            Message.conversation_id == conv.id,
-                            Message.created_at > last_read_msg.created_at,
-                            Message.sender_id != current_user.id  # Don't count own messages
-                        )
-                        unread_result = await db.execute(unread_stmt)
-                        unread_count = unread_result.scalar() or 0
-                else:
-                    # No last read message - count all messages from others
-                    unread_stmt = select(func.count(Message.id)).where(
-                        Message.conversation_id == conv.id,
-                        Message.sender_id != current_user.id
-                    )
-                    unread_result = await db.execute(unread_stmt)
-                    unread_count = unread_result.scalar() or 0
-
-            print(f"📊 Conversation {conv.id}: unread_count = {unread_count}")
-
-            # ✅ Get other user for DM (to get name and avatar)
-            other_user = None
-            if conv.kind == 'dm':
-                # Find the other user (not current user)
-                other_user_id = next((uid for uid in member_ids if uid != str(current_user.id)), None)
-                if other_user_id:
-                    user_stmt = select(User).where(User.id == UUID(other_user_id))
-                    user_result = await db.execute(user_stmt)
-                    other_user = user_result.scalar_one_or_none()
+        for row in rows:
+            conv = row.Conversation
+            member_ids = [str(uid) for uid in (row.member_ids or [])]
 
             # ✅ Format response to match frontend expectations
             conv_data = {
                 "id": str(conv.id),
-                "name": other_user.username if other_user else (conv.title or "Unknown"),
-                "avatar": other_user.avatar if other_user else conv.avatar_url,
-                "lastMessage": last_message.text if last_message else "",
-                "lastMessageTime": last_message.created_at.isoformat() if last_message else None,
-                "unreadCount": unread_count, 
-                "isOnline": False,  # Will be updated by frontend based on online users
+                "name": row.peer_username if row.peer_username else (conv.title or "Unknown"),
+                "avatar": row.peer_avatar if row.peer_username else conv.avatar_url,
+                "lastMessage": row.last_message_text or "",
+                "lastMessageTime": row.last_message_at.isoformat() if row.last_message_at else None,
+                "unreadCount": row.unread_count or 0,
+                "isOnline": peer_ids.get(str(conv.id)) in online_ids,
                 "isGroup": conv.kind == "group",
                 "members": member_ids,
                 "isPinned": False,
@@ -164,16 +89,43 @@ async def get_conversations(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Status of a message nobody else can receive (e.g. the sender is alone in the conversation)
+NO_RECIPIENTS = {"status": "sent", "recipients": 0, "delivered": 0, "read": 0}
+
+
+def _encode_cursor(msg: Message) -> str:
+    """Opaque keyset cursor for a message: base64 of (created_at, id)"""
+    raw = f"{msg.created_at.isoformat()}|{msg.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, msg_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), UUID(msg_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 # GET /api/v1/conversations/:id/messages - Get messages
 @router.get("/conversations/{conversation_id}/messages")
 async def get_messages(
     conversation_id: UUID,
     limit: int = Query(50, ge=1, le=100),
-    offset: int = Query(0, ge=0),
+    before: Optional[str] = Query(None, description="Cursor: messages older than this one"),
+    after: Optional[str] = Query(None, description="Cursor: messages newer than this one"),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get messages for a conversation"""
+    """
+    Get messages for a conversation, newest first
+
+    Pages are keyset ranges over (created_at, id) on the
+    (conversation_id, created_at, id) index, so deep scrolls cost the same
+    as the first page. Pass `paging.before` back as `before` to load older
+    messages, or `paging.after` as `after` to catch up on newer ones.
+    """
     try:
         # Verify user is member
         member_stmt = (
@@ -194,44 +146,74 @@ async def get_messages(
                 detail="Not a member of this conversation"
             )
 
-        # Get messages
-        stmt = (
-            select(Message)
-            .where(Message.conversation_id == conversation_id)
-            .order_by(Message.created_at.asc())
-            .limit(limit)
-            .offset(offset)
-        )
-        result = await db.execute(stmt)
-        messages = result.scalars().all()
+        if before and after:
+            raise HTTPException(status_code=400, detail="Use either 'before' or 'after', not both")
 
-        # Build response with sender info
-        response_data = []
-        for msg in messages:
-            # Get sender
-            sender_stmt = select(User).where(User.id == msg.sender_id)
+        # Get messages (one extra row tells us whether another page exists)
+        key = tuple_(Message.created_at, Message.id)
+        stmt = select(Message).where(Message.conversation_id == conversation_id)
+        if after:
+            stmt = stmt.where(key > tuple_(*_decode_cursor(after)))
+            stmt = stmt.order_by(Message.created_at.asc(), Message.id.asc())
+        else:
+            if before:
+                stmt = stmt.where(key < tuple_(*_decode_cursor(before)))
+            stmt = stmt.order_by(Message.created_at.desc(), Message.id.desc())
+
+        result = await db.execute(stmt.limit(limit + 1))
+        messages = list(result.scalars().all())
+
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        if after:
+            # Always hand pages back newest first
+            messages.reverse()
+
+        # ✅ Resolve all distinct senders of the page in one query
+        sender_ids = {msg.sender_id for msg in messages}
+        senders = {}
+        if sender_ids:
+            sender_stmt = select(
+                User.id, User.username, User.email, User.avatar
+            ).where(User.id.in_(sender_ids))
             sender_result = await db.execute(sender_stmt)
-            sender = sender_result.scalar_one_or_none()
+            senders = {
+                row.id: {
+                    "id": str(row.id),
+                    "username": row.username,
+                    "email": row.email,
+                    "avatar": row.avatar
+                }
+                for row in sender_result
+            }
+
+        # Delivery/read status from member watermarks, one query per page
+        statuses = await ChatService.get_message_statuses(db, messages)
 
+        # Build response with sender info (shared dict per sender)
+        response_data = []
+        for msg in messages:
+            receipts = statuses.get(msg.id, NO_RECIPIENTS)
             msg_data = {
                 "id": str(msg.id),
                 "conversation_id": str(msg.conversation_id),
                 "sender_id": str(msg.sender_id),
                 "text": msg.text,
                 "created_at": msg.created_at.isoformat(),
-                "status": "delivered",  # Default status
-                "sender": {
-                    "id": str(sender.id),
-                    "username": sender.username,
-                    "email": sender.email,
-                    "avatar": sender.avatar
-                } if sender else None
+                "status": receipts["status"],
+                "receipts": receipts,
+                "sender": senders.get(msg.sender_id)
             }
             response_data.append(msg_data)
 
         return {
             "success": True,
             "data": response_data,
+            "paging": {
+                "before": _encode_cursor(messages[-1]) if messages else before,
+                "after": _encode_cursor(messages[0]) if messages else after,
+                "has_more": has_more
+            },
             "message": "Messages fetched successfully"
         }
 
@@ -244,6 +226,44 @@ async def get_messages(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# GET /api/v1/conversations/:id/messages/:message_id/status - Delivery/read status
+@router.get("/conversations/{conversation_id}/messages/{message_id}/status")
+async def get_message_status(
+    conversation_id: UUID,
+    message_id: UUID,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """How many recipients a message has been delivered to and read by ("read by 37/1000")"""
+    try:
+        if not await membership.is_member(str(current_user.id), str(conversation_id)):
+            raise HTTPException(status_code=403, detail="Not a member of this conversation")
+
+        msg_result = await db.execute(
+            select(Message).where(
+                Message.id == message_id,
+                Message.conversation_id == conversation_id
+            )
+        )
+        msg = msg_result.scalar_one_or_none()
+        if not msg:
+            raise HTTPException(status_code=404, detail="Message not found")
+
+        statuses = await ChatService.get_message_statuses(db, [msg])
+
+        return {
+            "success": True,
+            "data": {"message_id": str(msg.id), **statuses.get(msg.id, NO_RECIPIENTS)},
+            "message": "Message status fetched successfully"
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error fetching message status: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # backend/app/api/v1/chat.py - ADD MARK AS READ ENDPOINT
 
 @router.post("/conversations/{conversation_id}/mark-read")
@@ -265,20 +285,21 @@ async def mark_conversation_read(
         if not member:
             raise HTTPException(status_code=403, detail="Not a member of this conversation")
 
-        # Get latest message in conversation
-        latest_msg_stmt = (
-            select(Message)
-            .where(Message.conversation_id == conversation_id)
-            .order_by(Message.created_at.desc())
-            .limit(1)
+        # Latest message comes from the denormalized conversation row
+        latest_msg_stmt = select(Conversation.last_message_id, Conversation.last_message_at).where(
+            Conversation.id == conversation_id
         )
         latest_result = await db.execute(latest_msg_stmt)
-        latest_message = latest_result.scalar_one_or_none()
+        latest_message_id, latest_message_at = latest_result.one_or_none() or (None, None)
 
-        if latest_message:
-            # Update last_read_message_id
-            member.last_read_message_id = latest_message.id
+        if latest_message_id:
+            # Move the read (and delivered) watermark to the latest message and reset the unread counter
+            member.last_read_message_id = latest_message_id
+            member.last_read_message_at = latest_message_at
             member.last_read_at = datetime.now(timezone.utc)
+            member.unread_count = 0
+            member.last_delivered_message_id = latest_message_id
+            member.last_delivered_message_at = latest_message_at
             await db.commit()
 
             print(f"✅ Marked conversation {conversation_id} as read for user {current_user.id}")
@@ -286,7 +307,7 @@ async def mark_conversation_read(
             return {
                 "success": True,
                 "message": "Conversation marked as read",
-                "last_read_message_id": str(latest_message.id)
+                "last_read_message_id": str(latest_message_id)
             }
         else:
             return {
@@ -385,6 +406,11 @@ async def create_conversation(
         await db.commit()
         await db.refresh(new_conv)
 
+        # ✅ Drop cached membership (e.g. negative checks) on every node
+        await membership.publish_invalidation(
+            new_conv.id, [current_user.id, *request.participant_ids]
+        )
+
         # Get other user info for DM
         other_user = None
         if new_conv.kind == 'dm':
@@ -467,4 +493,31 @@ async def get_users(
         print(f"❌ Error fetching users: {e}")
         import traceback
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# POST /api/v1/users/online - Bulk presence lookup
+@router.post("/users/online")
+async def get_online_users(
+    request: OnlineUsersRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Which of the given users are online right now"""
+    if len(request.user_ids) > 500:
+        raise HTTPException(status_code=400, detail="At most 500 user IDs per request")
+
+    try:
+        online_ids = await presence.online_among(request.user_ids)
+
+        return {
+            "success": True,
+            "data": {
+                "online": sorted(online_ids),
+                "offline": sorted(set(request.user_ids) - online_ids)
+            },
+            "message": "Presence fetched successfully"
+        }
+
+    except Exception as e:
+        print(f"❌ Error fetching presence: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,85 @@
+# backend/app/core/cache.py
+
+"""
+In-process caching helpers.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+MISSING = object()
+
+
+class TTLCache:
+    """LRU map bounded to max_entries whose entries also expire after ttl seconds"""
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+async def listen_for_invalidations(
+    redis,
+    channel: str,
+    handle: Callable[[str], Awaitable[None]],
+    on_reconnect: Callable[[], Awaitable[None]] | None = None,
+    name: str = "cache",
+) -> None:
+    """
+    Run handle(data) for every message published on a Redis channel, forever.
+
+    A message that fails to handle is logged and skipped. A lost connection
+    is retried; on_reconnect runs once subscribed again, since invalidations
+    published meanwhile were missed.
+    """
+    subscribed_before = False
+    while True:
+        pubsub = redis.pubsub()
+        try:
+            await pubsub.subscribe(channel)
+            if subscribed_before and on_reconnect:
+                await on_reconnect()
+            subscribed_before = True
+            async for msg in pubsub.listen():
+                if msg["type"] != "message":
+                    continue
+                try:
+                    await handle(msg["data"])
+                except Exception as e:
+                    print(f"❌ Bad {name} invalidation {msg['data']!r}: {e}")
+        except Exception as e:
+            print(f"❌ {name} invalidation listener disconnected, retrying: {e}")
+            await asyncio.sleep(1)
+        finally:
+            try:
+                await pubsub.reset()
+            except Exception:
+                pass
@@ -0,0 +1,52 @@
+# backend/app/core/metrics.py
+
+"""
+Minimal in-process metrics registry.
+
+Gauges and counters are keyed by name + labels. The API exposes a snapshot
+at GET /metrics; background processes (the message worker) log it.
+"""
+from collections import defaultdict
+from typing import Callable
+
+_gauges: dict[tuple, float] = {}
+_counters: dict[tuple, float] = defaultdict(float)
+_collectors: list[Callable[[], None]] = []
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+
+def set_gauge(name: str, value: float, **labels) -> None:
+    """Record the current value of a gauge"""
+    _gauges[_key(name, labels)] = value
+
+
+def inc(name: str, amount: float = 1, **labels) -> None:
+    """Increment a monotonically increasing counter"""
+    _counters[_key(name, labels)] += amount
+
+
+def remove(name: str, **labels) -> None:
+    """Drop a gauge series whose subject is gone (e.g. a closed socket)"""
+    _gauges.pop(_key(name, labels), None)
+
+
+def register_collector(collector: Callable[[], None]) -> None:
+    """Run collector before every snapshot, for gauges too hot to update inline"""
+    _collectors.append(collector)
+
+
+def snapshot() -> dict:
+    """All series as plain JSON-friendly dicts"""
+    for collector in _collectors:
+        collector()
+
+    def _series(store: dict) -> list[dict]:
+        return [
+            {"name": name, "labels": dict(labels), "value": value}
+            for (name, labels), value in sorted(store.items())
+        ]
+
+    return {"gauges": _series(_gauges), "counters": _series(_counters)}
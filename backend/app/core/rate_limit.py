@@ -0,0 +1,150 @@
+# backend/app/core/rate_limit.py
+
+"""
+Sliding-window rate limits for the auth endpoints.
+
+Each limited request is logged in a Redis sorted set per key (scored by
+time) and checked with a single pipelined round trip, before any database
+or bcrypt work. Rejected keys are remembered in-process until their window
+frees up, so a burst of retries is turned away without touching Redis or
+Postgres at all.
+"""
+import time
+import uuid
+from fastapi import HTTPException, Request, status
+from redis.asyncio import Redis
+
+from app.config.settings import settings
+from app.core import metrics
+from app.core.cache import MISSING, TTLCache
+
+KEY_PREFIX = "papyris:ratelimit"
+
+_redis = Redis.from_url(settings.redis_dsn, decode_responses=True)
+
+# (scope, key) -> monotonic time the key may try again
+_blocked = TTLCache(max_entries=100000, ttl=settings.RATE_LIMIT_WINDOW)
+
+
+def client_ip(request: Request) -> str:
+    if settings.RATE_LIMIT_TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+class RateLimit:
+    """
+    FastAPI dependency limiting a scope per client IP and, optionally, per
+    identifier taken from the JSON body (e.g. the login identifier).
+
+    Usage:
+        @router.post("/login", dependencies=[Depends(login_rate_limit)])
+    """
+
+    def __init__(
+        self,
+        scope: str,
+        per_ip: int,
+        per_identifier: int | None = None,
+        identifier_field: str = "identifier",
+        window: int | None = None,
+    ) -> None:
+        self.scope = scope
+        self.per_ip = per_ip
+        self.per_identifier = per_identifier
+        self.identifier_field = identifier_field
+        self.window = window or settings.RATE_LIMIT_WINDOW
+
+    async def _identifier(self, request: Request) -> str | None:
+        try:
+            body = await request.json()  # cached by Starlette; the endpoint parses the same body
+        except Exception:
+            return None
+        value = body.get(self.identifier_field) if isinstance(body, dict) else None
+        if not value:
+            return None
+        return str(value).strip().lower() or None
+
+    def _reject(self, retry_after: float) -> HTTPException:
+        metrics.inc("rate_limit_rejected", scope=self.scope)
+        seconds = max(1, int(retry_after + 0.999))
+        return HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Too many attempts, try again in {seconds} seconds",
+            headers={"Retry-After": str(seconds)},
+        )
+
+    async def hit(self, limits: dict[str, int]) -> float | None:
+        """
+        Record one attempt for every key; returns seconds until the first
+        over-limit key frees up, or None if all are within their limits
+        """
+        now = time.time()
+        member = f"{now:.6f}-{uuid.uuid4().hex[:8]}"
+        redis_keys = {key: f"{KEY_PREFIX}:{self.scope}:{key}" for key in limits}
+
+        async with _redis.pipeline(transaction=True) as pipe:
+            for redis_key in redis_keys.values():
+                pipe.zremrangebyscore(redis_key, 0, now - self.window)
+                pipe.zadd(redis_key, {member: now})
+                pipe.zcard(redis_key)
+                pipe.zrange(redis_key, 0, 0, withscores=True)
+                pipe.expire(redis_key, self.window)
+            results = await pipe.execute()
+
+        retry_after = None
+        for i, (key, limit) in enumerate(limits.items()):
+            count, oldest = results[i * 5 + 2], results[i * 5 + 3]
+            if count > limit:
+                wait = (oldest[0][1] if oldest else now) + self.window - now
+                retry_after = max(retry_after or 0, wait)
+                _blocked.set((self.scope, key), time.monotonic() + wait, ttl=wait)
+
+        if retry_after is not None:
+            # Rejected attempts don't use up the window
+            async with _redis.pipeline(transaction=False) as pipe:
+                for redis_key in redis_keys.values():
+                    pipe.zrem(redis_key, member)
+                await pipe.execute()
+        return retry_after
+
+    async def __call__(self, request: Request) -> None:
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+
+        limits = {f"ip:{client_ip(request)}": self.per_ip}
+        if self.per_identifier:
+            identifier = await self._identifier(request)
+            if identifier:
+                limits[f"id:{identifier}"] = self.per_identifier
+
+        # Known-blocked keys are rejected locally
+        for key in limits:
+            until = _blocked.get((self.scope, key))
+            if until is not MISSING:
+                raise self._reject(until - time.monotonic())
+
+        try:
+            retry_after = await self.hit(limits)
+        except Exception as e:
+            # Fail open: an unavailable Redis must not lock everyone out
+            print(f"❌ Rate limit check failed for {self.scope}: {e}")
+            return
+
+        if retry_after is not None:
+            raise self._reject(retry_after)
+
+
+login_rate_limit = RateLimit(
+    "login",
+    per_ip=settings.LOGIN_RATE_LIMIT_PER_IP,
+    per_identifier=settings.LOGIN_RATE_LIMIT_PER_IDENTIFIER,
+)
+forgot_password_rate_limit = RateLimit(
+    "forgot-password",
+    per_ip=settings.FORGOT_PASSWORD_RATE_LIMIT_PER_IP,
+    per_identifier=settings.FORGOT_PASSWORD_RATE_LIMIT_PER_IDENTIFIER,
+)
+register_rate_limit = RateLimit("register", per_ip=settings.REGISTER_RATE_LIMIT_PER_IP)
@@ -1,10 +1,16 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any, Optional
+from typing import Any, Callable, Optional
+import hashlib
+import time
 import bcrypt
 from fastapi import HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from app.config.settings import settings
+from app.core import metrics
+from app.core.cache import MISSING, TTLCache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
@@ -17,6 +23,46 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     password_bytes = plain_password.encode('utf-8')[:72]
     return bcrypt.checkpw(password_bytes, hashed_password.encode('utf-8'))
 
+# bcrypt releases the GIL, so a few threads keep 100-300 ms hashes off the
+# event loop without stalling the WebSockets served by this process
+_password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt"
+)
+_password_slots = asyncio.Semaphore(settings.PASSWORD_HASH_WORKERS)
+_password_waiting = 0
+
+def _report_password_queue() -> None:
+    metrics.set_gauge("password_hash_queue_depth", _password_waiting)
+
+metrics.register_collector(_report_password_queue)
+
+async def _run_password_job(fn: Callable, *args):
+    global _password_waiting
+    if _password_waiting >= settings.PASSWORD_HASH_MAX_QUEUE:
+        metrics.inc("password_hash_rejected")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again",
+        )
+
+    _password_waiting += 1
+    try:
+        await _password_slots.acquire()
+    finally:
+        _password_waiting -= 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_password_executor, fn, *args)
+    finally:
+        _password_slots.release()
+
+async def hash_password_async(password: str) -> str:
+    """hash_password on the bcrypt pool"""
+    return await _run_password_job(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the bcrypt pool"""
+    return await _run_password_job(verify_password, plain_password, hashed_password)
+
 def create_access_token(subject: str, expires_minutes: Optional[int] = None) -> str:
     expire = datetime.now(timezone.utc) + timedelta(
         minutes=expires_minutes or settings.ACCESS_TOKEN_EXPIRE_MINUTES
@@ -29,9 +75,35 @@ def create_access_token(subject: str, expires_minutes: Optional[int] = None) ->
     }
     return jwt.encode(payload, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
 
+# Payloads of tokens that already passed verification, keyed by token hash
+_verified_tokens = TTLCache(settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_TOKEN_CACHE_TTL)
+
+def verify_token(token: str) -> dict[str, Any]:
+    """
+    Decode and verify a JWT, raising JWTError if it is invalid.
+
+    A verified payload is cached under the SHA-256 of the token for at most
+    AUTH_TOKEN_CACHE_TTL seconds and never past its own exp, so repeated
+    requests with the same token skip the signature check.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    payload = _verified_tokens.get(key)
+    if payload is not MISSING:
+        metrics.inc("auth_token_cache_hits")
+        return payload
+    metrics.inc("auth_token_cache_misses")
+
+    payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+    ttl = settings.AUTH_TOKEN_CACHE_TTL
+    if "exp" in payload:
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        _verified_tokens.set(key, payload, ttl)
+    return payload
+
 def decode_token(token: str) -> dict[str, Any]:
     try:
-        return jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+        return verify_token(token)
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
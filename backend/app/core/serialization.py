@@ -0,0 +1,43 @@
+# backend/app/core/serialization.py
+
+"""
+JSON encoding shared by the HTTP responses and the WebSocket layer.
+
+Uses orjson when it is installed and falls back to the standard library
+otherwise; both produce compact UTF-8 output.
+"""
+import json
+from typing import Any
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+JSON_BACKEND = "orjson" if orjson else "json"
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    if orjson:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps(obj: Any) -> str:
+    if orjson:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def loads(data: str | bytes) -> Any:
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the fast backend"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
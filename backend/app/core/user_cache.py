@@ -0,0 +1,87 @@
+# backend/app/core/user_cache.py
+
+import asyncio
+import uuid
+from typing import NamedTuple
+from redis.asyncio import Redis
+from sqlalchemy import select
+
+from app.config.settings import settings
+from app.core import metrics
+from app.core.cache import MISSING, TTLCache, listen_for_invalidations
+from app.models.user import User
+from app.websocket.profiles import PROFILE_CHANNEL
+
+
+class CachedUser(NamedTuple):
+    id: uuid.UUID
+    username: str
+    avatar: str | None
+    is_active: bool
+
+
+class UserCache:
+    """
+    The few user fields authenticated REST requests need, by user ID.
+
+    Entries live for AUTH_USER_CACHE_TTL seconds. Code that changes a
+    user's name, avatar, password or active flag calls publish_change,
+    which drops the entry on every node (and reloads the WebSocket profile)
+    through the profile-changed Redis channel.
+    """
+
+    def __init__(self) -> None:
+        self.redis = Redis.from_url(settings.redis_dsn, decode_responses=True)
+        self._users = TTLCache(settings.AUTH_USER_CACHE_SIZE, settings.AUTH_USER_CACHE_TTL)
+        self._task: asyncio.Task | None = None
+
+    async def get(self, db, user_id: uuid.UUID) -> CachedUser | None:
+        """Cached user, loading it with db on a miss; None if it doesn't exist"""
+        user = self._users.get(user_id)
+        if user is not MISSING:
+            metrics.inc("auth_user_cache_hits")
+            return user
+        metrics.inc("auth_user_cache_misses")
+
+        result = await db.execute(
+            select(User.id, User.username, User.avatar, User.is_active).where(User.id == user_id)
+        )
+        row = result.first()
+        if row is None:
+            return None
+        user = CachedUser(row.id, row.username, row.avatar, row.is_active is not False)
+        self._users.set(user_id, user)
+        return user
+
+    def forget(self, user_id) -> None:
+        self._users.pop(uuid.UUID(str(user_id)))
+
+    async def publish_change(self, user_id) -> None:
+        """Call after committing a change to a user's profile, password or status"""
+        self.forget(user_id)
+        try:
+            await self.redis.publish(PROFILE_CHANNEL, str(user_id))
+        except Exception as e:
+            print(f"❌ User change publish failed: {e}")
+
+    async def _on_change(self, user_id: str) -> None:
+        self.forget(user_id)
+
+    async def _on_reconnect(self) -> None:
+        self._users.clear()  # changes may have been missed
+
+    async def run(self) -> None:
+        await listen_for_invalidations(
+            self.redis, PROFILE_CHANNEL, self._on_change, self._on_reconnect, "user"
+        )
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+        await self.redis.close()
+
+
+user_cache = UserCache()
@@ -0,0 +1,96 @@
+# backend/app/db/pool.py
+
+"""
+Connection pool instrumentation.
+
+Exports checkout wait time, timeouts and saturation as metrics, and warns
+when a connection is held for longer than DB_POOL_HOLD_WARNING_MS (usually
+a request awaiting Redis, SMTP or another service while its transaction
+is open), naming the request that held it.
+"""
+import time
+from contextvars import ContextVar
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+
+from app.config.settings import settings
+from app.core import metrics
+
+# What the current task is doing ("POST /api/v1/auth/login"); set per request by DBScopeMiddleware
+db_scope: ContextVar[str | None] = ContextVar("db_scope", default=None)
+
+
+class _TimedCheckout:
+    """Pool mixin recording how long each checkout waited"""
+
+    max_wait_ms = 0.0  # longest checkout wait since the last metrics snapshot
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            metrics.inc("db_pool_timeouts")
+            print(f"❌ DB pool exhausted ({self.status()}) during {db_scope.get() or 'background task'}")
+            raise
+        finally:
+            wait_ms = (time.perf_counter() - start) * 1000
+            metrics.inc("db_pool_checkouts")
+            metrics.inc("db_pool_checkout_wait_ms", wait_ms)
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+class InstrumentedNullPool(_TimedCheckout, NullPool):
+    """Connection per checkout (PgBouncer mode); the wait is the connect time"""
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy) -> None:
+    connection_record.info["checked_out_at"] = time.perf_counter()
+    connection_record.info["scope"] = db_scope.get()
+
+
+def _on_checkin(dbapi_connection, connection_record) -> None:
+    checked_out_at = connection_record.info.pop("checked_out_at", None)
+    scope = connection_record.info.pop("scope", None)
+    if checked_out_at is None or not settings.DB_POOL_HOLD_WARNING_MS:
+        return
+    held_ms = (time.perf_counter() - checked_out_at) * 1000
+    if held_ms > settings.DB_POOL_HOLD_WARNING_MS:
+        metrics.inc("db_pool_long_holds")
+        print(f"⚠️ DB connection held for {held_ms:.0f} ms by {scope or 'background task'}")
+
+
+def instrument(engine) -> None:
+    """Attach hold-time tracking and scrape-time pool gauges to an async engine's pool"""
+    event.listen(engine.sync_engine.pool, "checkout", _on_checkout)
+    event.listen(engine.sync_engine.pool, "checkin", _on_checkin)
+
+    def report() -> None:
+        pool = engine.sync_engine.pool  # replaced by engine.dispose()
+        metrics.set_gauge("db_pool_checkout_wait_max_ms", round(getattr(pool, "max_wait_ms", 0.0), 2))
+        pool.max_wait_ms = 0.0
+        if isinstance(pool, NullPool):
+            return
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        metrics.set_gauge("db_pool_size", pool.size())
+        metrics.set_gauge("db_pool_checked_out", pool.checkedout())
+        metrics.set_gauge("db_pool_overflow", max(pool.overflow(), 0))
+        metrics.set_gauge("db_pool_saturation", round(pool.checkedout() / capacity, 3) if capacity else 0)
+
+    metrics.register_collector(report)
+
+
+class DBScopeMiddleware:
+    """ASGI middleware labelling pool warnings with the request's method and path"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket"):
+            db_scope.set(f"{scope.get('method', 'WS')} {scope['path']}")
+        await self.app(scope, receive, send)
@@ -30,24 +30,47 @@
 
 
 
+import uuid
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import sessionmaker
 from app.config.settings import settings
+from app.db import pool
+
+
+def _engine_options() -> dict:
+    if settings.DB_PGBOUNCER:
+        # PgBouncer (transaction mode) owns the pool; a statement prepared on
+        # one server connection may not exist on the next, so asyncpg's and
+        # SQLAlchemy's statement caches are off and every prepared statement
+        # gets a unique name
+        return {
+            "poolclass": pool.InstrumentedNullPool,
+            "connect_args": {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+            },
+        }
+
+    # Pool sizing is per process: size + overflow across every API and worker
+    # process must stay below Postgres' max_connections
+    return {
+        "poolclass": pool.InstrumentedAsyncQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": {"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE},
+    }
+
 
 engine = create_async_engine(
     settings.DATABASE_URL,
     echo=settings.DEBUG,
-    pool_size=5,
-    max_overflow=10,
-    pool_timeout=30,
-    future=True
-)
-
-AsyncSessionLocal = sessionmaker(
-    bind=engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
+    future=True,
+    **_engine_options()
 )
+pool.instrument(engine)
 
 async_session_maker = async_sessionmaker(
     bind=engine,
@@ -55,6 +78,9 @@ async_session_maker = async_sessionmaker(
     expire_on_commit=False,
 )
 
+# Older name for the same factory
+AsyncSessionLocal = async_session_maker
+
 async def get_db():
-    async with AsyncSessionLocal() as session:
-        yield session
\ No newline at end of file
+    async with async_session_maker() as session:
+        yield session
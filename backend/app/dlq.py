@@ -0,0 +1,80 @@
+# backend/app/dlq.py
+
+"""
+Inspect and replay the message dead-letter stream.
+
+Entries land here when the worker gives up on them after
+WORKER_MAX_DELIVERIES attempts (see MessageWorker.reclaim).
+
+Usage:
+    python -m app.dlq list [--count 20]
+    python -m app.dlq replay <dlq-entry-id> [<dlq-entry-id> ...]
+    python -m app.dlq replay --all
+    python -m app.dlq purge
+"""
+
+import argparse
+import asyncio
+import json
+
+from app.websocket.streams import RedisStreams, DLQ_KEY
+
+
+async def list_entries(streams: RedisStreams, count: int):
+    entries = await streams.read_dead_letters(count=count)
+    if not entries:
+        print(f"✅ {DLQ_KEY} is empty")
+        return
+
+    for dlq_id, fields in entries:
+        data = json.loads(fields.get("data", "{}"))
+        print(
+            f"{dlq_id}  source={fields.get('sourceId')}  deliveries={fields.get('deliveries')}  "
+            f"message={data.get('messageId')}  conversation={data.get('conversationId')}"
+        )
+    print(f"\n{len(entries)} entries shown")
+
+
+async def replay(streams: RedisStreams, ids: list[str], replay_all: bool):
+    if replay_all:
+        ids = [dlq_id for dlq_id, _ in await streams.read_dead_letters(count=10000)]
+
+    for dlq_id in ids:
+        new_id = await streams.replay_dead_letter(dlq_id)
+        if new_id:
+            print(f"♻️ {dlq_id} re-queued as {new_id}")
+        else:
+            print(f"⚠️ {dlq_id} not found in {DLQ_KEY}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(prog="python -m app.dlq", description="Message dead-letter stream tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    list_cmd = sub.add_parser("list", help="Show dead-lettered entries")
+    list_cmd.add_argument("--count", type=int, default=20)
+
+    replay_cmd = sub.add_parser("replay", help="Move entries back onto the message stream")
+    replay_cmd.add_argument("ids", nargs="*")
+    replay_cmd.add_argument("--all", action="store_true", dest="replay_all")
+
+    sub.add_parser("purge", help="Delete the dead-letter stream")
+
+    args = parser.parse_args()
+    streams = RedisStreams()
+    try:
+        if args.command == "list":
+            await list_entries(streams, args.count)
+        elif args.command == "replay":
+            if not args.ids and not args.replay_all:
+                parser.error("give entry IDs or --all")
+            await replay(streams, args.ids, args.replay_all)
+        elif args.command == "purge":
+            await streams.purge_dead_letters()
+            print(f"🗑️ {DLQ_KEY} deleted")
+    finally:
+        await streams.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,154 @@
+# backend/app/email_worker.py
+
+"""
+Outbound email sender.
+
+Consumes the email stream filled by the API and sends each read batch over
+one reused connection of the configured backend (SMTP, console or file).
+Mails that fail transiently stay pending and are retried after
+EMAIL_RETRY_IDLE_MS; permanent failures and mails that keep failing go to
+the email dead-letter stream.
+
+Run with:
+    python -m app.email_worker
+"""
+import asyncio
+import json
+import os
+import socket
+
+from app.config.settings import settings
+from app.core import metrics
+from app.services.email_queue import EmailQueue
+from app.services.email_service import PermanentEmailError, email_service, get_backend
+
+
+class EmailWorker:
+    def __init__(self, backend=None):
+        self.queue = EmailQueue()
+        self.backend = backend or get_backend()
+        self.consumer_name = f"email-{socket.gethostname()}-{os.getpid()}"  # unique per process
+        self.running = False
+        self._reclaim_task: asyncio.Task | None = None
+
+    async def start(self):
+        print(f"🚀 Starting email worker: {self.consumer_name} ({type(self.backend).__name__})")
+        await self.queue.init_group()
+        self.running = True
+        self._reclaim_task = asyncio.create_task(self.reclaim_loop())
+
+        try:
+            await self.consume_loop()
+        except KeyboardInterrupt:
+            print("\n⚠️ Received interrupt signal")
+        finally:
+            await self.stop()
+
+    async def stop(self):
+        print("🛑 Stopping email worker...")
+        self.running = False
+        if self._reclaim_task:
+            self._reclaim_task.cancel()
+        # Unsent mails stay pending in the stream and are retried
+        await asyncio.to_thread(self.backend.close)
+        await self.queue.close()
+
+    async def consume_loop(self):
+        while self.running:
+            try:
+                results = await self.queue.read(
+                    self.consumer_name, count=settings.EMAIL_BATCH_SIZE, block=settings.WORKER_BLOCK_MS
+                )
+                if results:
+                    await self.send_batch([entry for _, entries in results for entry in entries])
+            except Exception as e:
+                print(f"❌ Error in email consume loop: {e}")
+                await asyncio.sleep(1)
+
+    def _send_all(self, entries: list[tuple[str, dict]]) -> tuple[list[str], list[tuple[str, dict, str]]]:
+        """
+        Send in order on the backend's connection (runs in a thread).
+
+        Returns (sent IDs, permanently failed entries). Stops at the first
+        transient failure: the rest stay pending and are retried later.
+        """
+        sent, failed = [], []
+        for msg_id, fields in entries:
+            try:
+                mail = json.loads(fields.get("data", "{}"))
+                msg = email_service.build_message(mail["to"], mail["subject"], mail["html"], mail.get("text"))
+            except (ValueError, KeyError, TypeError) as e:
+                failed.append((msg_id, fields, f"invalid entry: {e}"))
+                continue
+            try:
+                self.backend.send(msg)
+                sent.append(msg_id)
+            except PermanentEmailError as e:
+                failed.append((msg_id, fields, str(e)))
+            except Exception as e:
+                print(f"❌ Failed to send email {msg_id} to {mail['to']}, will retry: {e}")
+                metrics.inc("email_send_errors")
+                break
+        return sent, failed
+
+    async def send_batch(self, entries: list[tuple[str, dict]]):
+        sent, failed = await asyncio.to_thread(self._send_all, entries)
+
+        await self.queue.ack(sent)
+        for msg_id, fields, error in failed:
+            await self.queue.dead_letter(msg_id, fields, 1, error)
+            print(f"☠️ Email {msg_id} moved to dead-letter stream: {error}")
+
+        metrics.inc("email_sent", len(sent))
+        metrics.inc("email_dead_lettered", len(failed))
+        if sent:
+            print(f"✅ Sent {len(sent)} emails")
+
+    async def reclaim_loop(self):
+        """Retry mails left pending by failed sends or a crashed sender"""
+        while True:
+            await asyncio.sleep(settings.EMAIL_RECLAIM_INTERVAL)
+            try:
+                await self.reclaim()
+            except Exception as e:
+                print(f"❌ Error reclaiming pending emails: {e}")
+
+    async def reclaim(self):
+        start_id = "0-0"
+        while True:
+            start_id, entries = await self.queue.claim_idle(
+                self.consumer_name,
+                settings.EMAIL_RETRY_IDLE_MS,
+                start_id=start_id,
+                count=settings.EMAIL_BATCH_SIZE
+            )
+
+            if entries:
+                counts = await self.queue.delivery_counts(
+                    self.consumer_name, entries[0][0], entries[-1][0], len(entries)
+                )
+                retry = []
+                for msg_id, fields in entries:
+                    deliveries = counts.get(msg_id, 0)
+                    if deliveries > settings.EMAIL_MAX_DELIVERIES:
+                        await self.queue.dead_letter(msg_id, fields, deliveries, "too many attempts")
+                        metrics.inc("email_dead_lettered")
+                        print(f"☠️ Email {msg_id} moved to dead-letter stream after {deliveries} attempts")
+                    else:
+                        retry.append((msg_id, fields))
+
+                if retry:
+                    print(f"♻️ Retrying {len(retry)} pending emails")
+                    await self.send_batch(retry)
+
+            if start_id == "0-0":
+                break
+
+
+async def main():
+    worker = EmailWorker()
+    await worker.start()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,15 +1,22 @@
-from fastapi import FastAPI, Request
+import hmac
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
 import app.models
 from app.config.settings import settings
+from app.core import metrics
+from app.core.serialization import FastJSONResponse
+from app.core.user_cache import user_cache
+from app.db.pool import DBScopeMiddleware
+from app.services.email_queue import email_queue
 from app.api.v1 import api_router
 from app.websocket.routes import router as ws_router
 
-app = FastAPI(title=settings.APP_NAME)
+app = FastAPI(title=settings.APP_NAME, default_response_class=FastJSONResponse)
+
+app.add_middleware(DBScopeMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,19 +29,20 @@ app.add_middleware(
 # ✅ Wrap FastAPI HTTPException -> {success:false, message, data:null}
 @app.exception_handler(StarletteHTTPException)
 async def http_exception_handler(request: Request, exc: StarletteHTTPException):
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=exc.status_code,
         content={
             "success": False,
             "message": exc.detail,
             "data": None,
         },
+        headers=getattr(exc, "headers", None),
     )
 
 # ✅ Wrap validation errors too (422)
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=422,
         content={
             "success": False,
@@ -47,10 +55,32 @@ app.include_router(api_router, prefix="/api/v1")
 
 app.include_router(ws_router, prefix="/api/v1")
 
+@app.on_event("startup")
+async def startup():
+    user_cache.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await user_cache.stop()
+    await email_queue.close()
+
 @app.get("/health")
 async def health():
     return {"status": "ok"}
 
+def require_metrics_access(request: Request):
+    """Scrapers on METRICS_ALLOWED_IPS, or anyone holding METRICS_TOKEN"""
+    if request.client and request.client.host in settings.METRICS_ALLOWED_IPS:
+        return
+    token = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    if settings.METRICS_TOKEN and hmac.compare_digest(token, settings.METRICS_TOKEN):
+        return
+    raise HTTPException(status_code=403, detail="Not allowed to read metrics")
+
+@app.get("/metrics", dependencies=[Depends(require_metrics_access)])
+async def get_metrics():
+    return metrics.snapshot()
+
 @app.get("/")
 async def root():
     return {"message": "Backend works"}
@@ -35,6 +35,18 @@ class Conversation(Base):
     
     is_archived: Mapped[bool] = mapped_column(Boolean, default=False)
     
+    # Denormalized last message (maintained by the message worker)
+    last_message_id: Mapped[uuid.UUID | None] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("messages.id", ondelete="SET NULL", use_alter=True),
+        nullable=True
+    )
+    last_message_preview: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    last_message_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True
+    )
+    
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), 
         server_default=func.now()
@@ -1,7 +1,7 @@
 # backend/app/models/conversation_member.py - FIX TYPE
 
 import uuid
-from sqlalchemy import Boolean, ForeignKey, UniqueConstraint, DateTime, func, Index, Enum as SQLEnum
+from sqlalchemy import Boolean, Integer, ForeignKey, UniqueConstraint, DateTime, func, Index, Enum as SQLEnum
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 import enum
@@ -57,6 +57,25 @@ class ConversationMember(Base):
         nullable=True
     )
     
+    # Watermarks: (created_at, id) of the newest message delivered to and
+    # read by this member. Every message at or below a watermark counts as
+    # delivered/read, so per-message status is derived instead of stored.
+    last_read_message_at: Mapped[DateTime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True
+    )
+    last_delivered_message_id: Mapped[uuid.UUID | None] = mapped_column(
+        UUID(as_uuid=True),
+        nullable=True
+    )
+    last_delivered_message_at: Mapped[DateTime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True
+    )
+    
+    # Maintained by the message worker, reset when the member reads
+    unread_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    
     muted: Mapped[bool] = mapped_column(Boolean, default=False)
     
     joined_at: Mapped[DateTime] = mapped_column(
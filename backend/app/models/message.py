@@ -132,6 +132,8 @@ class Message(Base):
         Index('idx_message_conversation', 'conversation_id'),
         Index('idx_message_sender', 'sender_id'),
         Index('idx_message_created', 'created_at'),
+        # Keyset pagination: every history page is a range scan on this index
+        Index('idx_message_conversation_created_id', 'conversation_id', 'created_at', 'id'),
     )
 
     # ✅ FIX: All IDs should be UUID
@@ -184,4 +186,4 @@ class Message(Base):
     )
     
     sender = relationship("User")
-    conversation = relationship("Conversation")
\ No newline at end of file
+    conversation = relationship("Conversation", foreign_keys=[conversation_id])
\ No newline at end of file
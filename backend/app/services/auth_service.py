@@ -104,7 +104,8 @@ import re
 from app.models.user import User
 from app.schemas.user import UserCreate
 from app.schemas.auth import Token
-from app.core.security import hash_password, verify_password, create_access_token
+from app.core.security import hash_password_async, verify_password_async, create_access_token
+from app.core.user_cache import user_cache
 
 
 class AuthService:
@@ -167,7 +168,7 @@ class AuthService:
         user = User(
             username=user_in.username,
             email=user_in.email,
-            hashed_password=hash_password(user_in.password),
+            hashed_password=await hash_password_async(user_in.password),
             is_active=True,
         )
 
@@ -196,7 +197,7 @@ class AuthService:
                 detail="Username or email does not exist",
             )
 
-        if not verify_password(password, user.hashed_password):
+        if not await verify_password_async(password, user.hashed_password):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid credentials",
@@ -296,7 +297,7 @@ class AuthService:
         user = await AuthService.verify_reset_token(db, token)
         
         # Hash new password
-        user.hashed_password = hash_password(new_password)
+        user.hashed_password = await hash_password_async(new_password)
         
         # Clear reset token (single-use)
         user.reset_token = None
@@ -304,5 +305,6 @@ class AuthService:
         
         await db.commit()
         await db.refresh(user)
+        await user_cache.publish_change(user.id)
         
         return user
\ No newline at end of file
@@ -2,10 +2,12 @@
 
 import uuid
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_, and_, func
+from sqlalchemy import select, or_, and_, func, true, tuple_
+from sqlalchemy.orm import aliased
 from app.models.user import User
 from app.models.conversation import Conversation
 from app.models.conversation_member import ConversationMember, MemberRole
+from app.models.message import Message
 
 class ChatService:
     @staticmethod
@@ -16,6 +18,59 @@ class ChatService:
         res = await db.execute(stmt)
         return list(res.scalars().all())
 
+    @staticmethod
+    async def get_inbox(db: AsyncSession, user_id: uuid.UUID):
+        """
+        Fetch the whole conversation list for a user in a single query.
+
+        Last message and unread count are read from the denormalized columns
+        maintained by the message worker; member IDs are aggregated and the DM
+        peer comes from a LATERAL join, so the cost is O(conversations) in one
+        round trip regardless of how many messages each conversation holds.
+        """
+        me = aliased(ConversationMember)
+        peer_member = aliased(ConversationMember)
+
+        # Member IDs aggregated per conversation
+        member_ids = (
+            select(func.array_agg(ConversationMember.user_id))
+            .where(ConversationMember.conversation_id == Conversation.id)
+            .correlate(Conversation)
+            .scalar_subquery()
+        )
+
+        # The other participant of a DM (name and avatar)
+        peer = (
+            select(User.username, User.avatar)
+            .join(peer_member, peer_member.user_id == User.id)
+            .where(
+                Conversation.kind == 'dm',
+                peer_member.conversation_id == Conversation.id,
+                peer_member.user_id != user_id,
+            )
+            .limit(1)
+            .correlate(Conversation)
+            .lateral("peer")
+        )
+
+        stmt = (
+            select(
+                Conversation,
+                member_ids.label("member_ids"),
+                Conversation.last_message_preview.label("last_message_text"),
+                Conversation.last_message_at.label("last_message_at"),
+                me.unread_count.label("unread_count"),
+                peer.c.username.label("peer_username"),
+                peer.c.avatar.label("peer_avatar"),
+            )
+            .join(me, and_(me.conversation_id == Conversation.id, me.user_id == user_id))
+            .outerjoin(peer, true())
+            .order_by(Conversation.updated_at.desc())
+        )
+
+        result = await db.execute(stmt)
+        return result.all()
+
     @staticmethod
     async def create_dm(db: AsyncSession, current_user_id: uuid.UUID, other_user_id: uuid.UUID) -> Conversation:
         # Check if DM already exists
@@ -93,4 +148,59 @@ class ChatService:
 
         await db.commit()
         await db.refresh(conv)
-        return conv
\ No newline at end of file
+        return conv
+
+    @staticmethod
+    async def get_message_statuses(db: AsyncSession, messages: list[Message]) -> dict[uuid.UUID, dict]:
+        """
+        Delivery/read status of messages, derived from member watermarks.
+
+        A recipient has received (read) a message when their delivered (read)
+        watermark is at or past the message's (created_at, id), so a page of
+        messages costs one grouped query over the conversation's members and
+        nothing is stored per message.
+        """
+        if not messages:
+            return {}
+
+        position = tuple_(Message.created_at, Message.id)
+        delivered = tuple_(
+            ConversationMember.last_delivered_message_at,
+            ConversationMember.last_delivered_message_id
+        )
+        read = tuple_(ConversationMember.last_read_message_at, ConversationMember.last_read_message_id)
+
+        stmt = (
+            select(
+                Message.id,
+                func.count(ConversationMember.id).label("total"),
+                func.count(ConversationMember.id).filter(delivered >= position).label("delivered"),
+                func.count(ConversationMember.id).filter(read >= position).label("read"),
+            )
+            .join(
+                ConversationMember,
+                and_(
+                    ConversationMember.conversation_id == Message.conversation_id,
+                    ConversationMember.user_id != Message.sender_id
+                )
+            )
+            .where(Message.id.in_([msg.id for msg in messages]))
+            .group_by(Message.id)
+        )
+        result = await db.execute(stmt)
+
+        statuses = {}
+        for row in result:
+            if row.total and row.read == row.total:
+                status = "read"
+            elif row.total and row.delivered == row.total:
+                status = "delivered"
+            else:
+                status = "sent"
+            statuses[row.id] = {
+                "status": status,
+                "recipients": row.total,
+                "delivered": row.delivered,
+                "read": row.read
+            }
+        return statuses
@@ -0,0 +1,82 @@
+# backend/app/services/email_queue.py
+
+from redis.asyncio import Redis
+
+from app.config.settings import settings
+from app.core.serialization import dumps
+
+EMAIL_STREAM_KEY = settings.EMAIL_STREAM_KEY
+EMAIL_CONSUMER_GROUP = settings.EMAIL_CONSUMER_GROUP
+EMAIL_DLQ_KEY = f"{EMAIL_STREAM_KEY}:dlq"
+
+
+class EmailQueue:
+    """
+    Outbound mail on a Redis stream.
+
+    The API only XADDs the rendered mail, so a burst of password resets
+    costs one Redis round trip per request; python -m app.email_worker
+    consumes the stream and does the SMTP work.
+    """
+
+    def __init__(self):
+        self.redis = Redis.from_url(settings.redis_dsn, decode_responses=True)
+
+    async def enqueue(
+        self,
+        to_email: str,
+        subject: str,
+        html_content: str,
+        text_content: str | None = None
+    ) -> str:
+        data = dumps({
+            "to": to_email,
+            "subject": subject,
+            "html": html_content,
+            "text": text_content,
+        })
+        return await self.redis.xadd(
+            EMAIL_STREAM_KEY, {"data": data}, maxlen=settings.EMAIL_STREAM_MAX_LEN, approximate=True
+        )
+
+    async def init_group(self):
+        try:
+            await self.redis.xgroup_create(EMAIL_STREAM_KEY, EMAIL_CONSUMER_GROUP, id='0', mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                print(f"Email stream init: {e}")
+
+    async def read(self, consumer_name: str, count: int, block: int):
+        return await self.redis.xreadgroup(
+            EMAIL_CONSUMER_GROUP, consumer_name, {EMAIL_STREAM_KEY: '>'}, count=count, block=block
+        )
+
+    async def ack(self, ids: list[str]):
+        if ids:
+            await self.redis.xack(EMAIL_STREAM_KEY, EMAIL_CONSUMER_GROUP, *ids)
+
+    async def claim_idle(self, consumer_name: str, min_idle_ms: int, start_id: str = "0-0", count: int = 100):
+        """XAUTOCLAIM mails idle in the PEL; returns (next_start_id, entries)"""
+        result = await self.redis.xautoclaim(
+            EMAIL_STREAM_KEY, EMAIL_CONSUMER_GROUP, consumer_name, min_idle_ms, start_id=start_id, count=count
+        )
+        return result[0], [(msg_id, fields) for msg_id, fields in result[1] if fields is not None]
+
+    async def delivery_counts(self, consumer_name: str, min_id: str, max_id: str, count: int) -> dict:
+        pending = await self.redis.xpending_range(
+            EMAIL_STREAM_KEY, EMAIL_CONSUMER_GROUP, min=min_id, max=max_id, count=count, consumername=consumer_name
+        )
+        return {p["message_id"]: p["times_delivered"] for p in pending}
+
+    async def dead_letter(self, msg_id: str, fields: dict, deliveries: int, error: str):
+        """Move a mail to the dead-letter stream and ack it atomically"""
+        async with self.redis.pipeline(transaction=True) as p:
+            await p.xadd(EMAIL_DLQ_KEY, {**fields, "sourceId": msg_id, "deliveries": deliveries, "error": error})
+            await p.xack(EMAIL_STREAM_KEY, EMAIL_CONSUMER_GROUP, msg_id)
+            await p.execute()
+
+    async def close(self):
+        await self.redis.close()
+
+
+email_queue = EmailQueue()
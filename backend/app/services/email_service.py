@@ -2,11 +2,15 @@
 
 import os
 import smtplib
+import time
+import uuid
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import Optional
 import logging
 
+from app.config.settings import settings
+
 logger = logging.getLogger(__name__)
 
 class EmailService:
@@ -21,62 +25,29 @@ class EmailService:
         self.from_name = os.getenv("FROM_NAME", "Papyris")
         self.environment = os.getenv("ENV", "local")
         
-    def send_email(
+    def build_message(
         self,
         to_email: str,
         subject: str,
         html_content: str,
         text_content: Optional[str] = None
-    ) -> bool:
-        """Send an email (dev mode prints to console, prod sends real email)"""
-        
-        # In development, just print to console
-        if self.environment == "local" or self.environment == "development":
-            logger.info(f"\n{'='*80}")
-            logger.info(f"📧 EMAIL (DEV MODE - NOT ACTUALLY SENT)")
-            logger.info(f"{'='*80}")
-            logger.info(f"To: {to_email}")
-            logger.info(f"Subject: {subject}")
-            logger.info(f"\n{text_content or 'No text content'}")
-            logger.info(f"{'='*80}\n")
-            return True
-        
-        try:
-            # Create message
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = subject
-            msg['From'] = f"{self.from_name} <{self.from_email}>"
-            msg['To'] = to_email
-
-            # Add text part (fallback)
-            if text_content:
-                text_part = MIMEText(text_content, 'plain')
-                msg.attach(text_part)
-
-            # Add HTML part
-            html_part = MIMEText(html_content, 'html')
-            msg.attach(html_part)
-
-            # Send email
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_user, self.smtp_password)
-                server.send_message(msg)
-
-            logger.info(f"✅ Email sent to {to_email}")
-            return True
-
-        except Exception as e:
-            logger.error(f"❌ Failed to send email to {to_email}: {e}")
-            return False
-
-    def send_password_reset_email(
-        self,
-        to_email: str,
-        username: str,
-        reset_link: str
-    ) -> bool:
-        """Send password reset email with beautiful Papyris branding"""
+    ) -> MIMEMultipart:
+        """MIME message with a plain-text fallback and an HTML part"""
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = subject
+        msg['From'] = f"{self.from_name} <{self.from_email}>"
+        msg['To'] = to_email
+
+        # Add text part (fallback)
+        if text_content:
+            msg.attach(MIMEText(text_content, 'plain'))
+
+        # Add HTML part
+        msg.attach(MIMEText(html_content, 'html'))
+        return msg
+
+    def password_reset_email(self, username: str, reset_link: str) -> dict:
+        """Subject and bodies of the password reset email with beautiful Papyris branding"""
         
         subject = "Reset Your Papyris Password"
         
@@ -207,7 +178,121 @@ class EmailService:
         © 2024 Papyris
         """
         
-        return self.send_email(to_email, subject, html_content, text_content)
+        return {"subject": subject, "html_content": html_content, "text_content": text_content}
+
+
+class PermanentEmailError(Exception):
+    """The mail can never be delivered (e.g. recipient refused); don't retry it"""
+
+
+class ConsoleBackend:
+    """Prints mails instead of sending them (local development)"""
+
+    def send(self, msg: MIMEMultipart) -> None:
+        text = next(
+            (part.get_payload(decode=True).decode() for part in msg.get_payload()
+             if part.get_content_type() == 'text/plain'),
+            'No text content'
+        )
+        print(f"\n{'='*80}")
+        print(f"📧 EMAIL (DEV MODE - NOT ACTUALLY SENT)")
+        print(f"{'='*80}")
+        print(f"To: {msg['To']}")
+        print(f"Subject: {msg['Subject']}")
+        print(f"\n{text}")
+        print(f"{'='*80}\n")
+
+    def close(self) -> None:
+        pass
+
+
+class FileBackend:
+    """Writes each mail to EMAIL_FILE_DIR as an .eml file (tests, staging)"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def send(self, msg: MIMEMultipart) -> None:
+        name = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}.eml"
+        with open(os.path.join(self.directory, name), 'wb') as f:
+            f.write(msg.as_bytes())
+
+    def close(self) -> None:
+        pass
+
+
+class SMTPBackend:
+    """
+    Sends over one persistent SMTP connection.
+
+    The connection is opened on first use and reused for every following
+    mail; after EMAIL_SMTP_IDLE_TIMEOUT seconds without traffic it is
+    checked with NOOP, and a dropped connection is reopened once per mail.
+    """
+
+    def __init__(self, service: EmailService):
+        self.service = service
+        self._conn: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+
+    def _connect(self) -> smtplib.SMTP:
+        conn = smtplib.SMTP(self.service.smtp_host, self.service.smtp_port, timeout=30)
+        conn.starttls()
+        if self.service.smtp_user:
+            conn.login(self.service.smtp_user, self.service.smtp_password)
+        print(f"✅ SMTP connection opened to {self.service.smtp_host}")
+        return conn
+
+    def _connection(self) -> smtplib.SMTP:
+        if self._conn and time.monotonic() - self._last_used > settings.EMAIL_SMTP_IDLE_TIMEOUT:
+            try:
+                if self._conn.noop()[0] != 250:
+                    self.close()
+            except (smtplib.SMTPException, OSError):
+                self._conn = None
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+
+    def send(self, msg: MIMEMultipart) -> None:
+        for attempt in (1, 2):
+            conn = self._connection()
+            try:
+                conn.send_message(msg)
+                self._last_used = time.monotonic()
+                return
+            except smtplib.SMTPRecipientsRefused as e:
+                raise PermanentEmailError(str(e))
+            except smtplib.SMTPResponseException as e:
+                if 500 <= e.smtp_code < 600:
+                    raise PermanentEmailError(f"{e.smtp_code} {e.smtp_error!r}")
+                raise
+            except (smtplib.SMTPServerDisconnected, OSError):
+                self._conn = None
+                if attempt == 2:
+                    raise
+
+    def close(self) -> None:
+        if self._conn:
+            try:
+                self._conn.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._conn = None
+
+
+def get_backend(service: Optional["EmailService"] = None):
+    """Backend selected by EMAIL_BACKEND (console in local/development by default)"""
+    service = service or email_service
+    backend = settings.EMAIL_BACKEND
+    if backend is None:
+        backend = "console" if service.environment in ("local", "development") else "smtp"
+    if backend == "file":
+        return FileBackend(settings.EMAIL_FILE_DIR)
+    if backend == "smtp":
+        return SMTPBackend(service)
+    return ConsoleBackend()
 
 
 # Create singleton instance
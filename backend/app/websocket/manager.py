@@ -1,39 +1,239 @@
-
 from __future__ import annotations
-from typing import Dict, Set
+import asyncio
+import itertools
+import time
+from collections import deque
+from typing import Dict, Iterable, NamedTuple, Set, TYPE_CHECKING
 from fastapi import WebSocket
 
+from app.config.settings import settings
+from app.core import metrics
+from app.core.serialization import dumps
+
+if TYPE_CHECKING:
+    from app.websocket.pubsub import PubSub
+
+# Events that only carry the latest state - a newer one replaces a queued one
+COALESCE_TYPES = {"typing", "read", "online", "offline"}
+
+
+def coalesce_key(payload: dict) -> tuple | None:
+    if payload.get("type") not in COALESCE_TYPES:
+        return None
+    return (payload.get("type"), payload.get("roomId"), payload.get("userId"))
+
+
+class Frame(NamedTuple):
+    """A payload encoded once, ready to be sent as-is to any number of sockets"""
+    text: str
+    key: tuple | None = None
+
+
+def encode_frame(payload: dict | Frame) -> Frame:
+    if isinstance(payload, Frame):
+        return payload
+    return Frame(dumps(payload), coalesce_key(payload))
+
+
+class SocketWriter:
+    """
+    Bounded outbound queue and writer task for one socket.
+
+    Senders only enqueue; the writer task drains the queue at whatever pace
+    the client reads, so a slow client backs up its own queue instead of
+    every broadcast. State-only events (typing, read, presence) replace
+    their still-queued predecessor under any policy. When the queue is full
+    WS_SLOW_CONSUMER_POLICY decides: "drop" discards a new state-only frame,
+    "coalesce" evicts the oldest queued state-only frame, and "disconnect"
+    closes the socket. Chat messages are never discarded: if "drop" or
+    "coalesce" can't make room without losing one, the socket is closed
+    with 1013 so the client reconnects and resyncs.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, ws: WebSocket, user_id: str) -> None:
+        self.ws = ws
+        self.user_id = user_id
+        self.conn_id = next(self._ids)
+        self.frames: deque[list] = deque()  # [coalesce_key, frame text]
+        self.pending: Dict[tuple, list] = {}
+        self.ready = asyncio.Event()
+        self.closed = False
+        self.last_seen = time.monotonic()  # last inbound frame
+        self._task = asyncio.create_task(self.run())
+
+    def enqueue(self, frame: Frame) -> bool:
+        if self.closed:
+            return False
+
+        key = frame.key
+        queued = self.pending.get(key) if key is not None else None
+        if queued is not None:
+            queued[1] = frame.text
+            return True
+
+        if len(self.frames) >= settings.WS_SEND_QUEUE_SIZE:
+            policy = settings.WS_SLOW_CONSUMER_POLICY
+            metrics.inc("ws_slow_consumer_events", policy=policy)
+            if policy == "drop" and key is not None:
+                return False
+            if policy != "coalesce" or not self._evict_state_frame():
+                self._disconnect_slow()
+                return False
+
+        item = [key, frame.text]
+        self.frames.append(item)
+        if key is not None:
+            self.pending[key] = item
+        self.ready.set()
+        return True
+
+    def _pop(self):
+        key, frame = item = self.frames.popleft()
+        if key is not None and self.pending.get(key) is item:
+            del self.pending[key]
+        return frame
+
+    def _evict_state_frame(self) -> bool:
+        """Drop the oldest queued state-only frame; False if every queued frame is a message"""
+        for item in self.frames:
+            if item[0] is not None:
+                self.frames.remove(item)
+                del self.pending[item[0]]
+                return True
+        return False
+
+    def _disconnect_slow(self) -> None:
+        print(f"🐢 [WS] Disconnecting slow consumer {self.user_id[:8]} (conn {self.conn_id})")
+        self.closed = True
+        self.frames.clear()
+        self.pending.clear()
+        self.ready.set()  # the writer task closes the socket
+
+    async def run(self) -> None:
+        try:
+            while True:
+                await self.ready.wait()
+                self.ready.clear()
+                while self.frames and not self.closed:
+                    frame = self._pop()
+                    await self.ws.send_text(frame)
+                if self.closed:
+                    await self._close_socket()
+                    return
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Socket is gone; the receive loop cleans up the connection
+            print(f"❌ [WS] Writer for {self.user_id[:8]} stopped: {e}")
+            self.closed = True
+            self.frames.clear()
+            self.pending.clear()
+
+    async def _close_socket(self) -> None:
+        try:
+            await self.ws.close(code=1013, reason="Slow consumer")
+        except Exception:
+            pass
+
+    def close(self) -> None:
+        self.closed = True
+        self.frames.clear()
+        self.pending.clear()
+        self._task.cancel()
+
+
 class WSManager:
-    def __init__(self) -> None:
+    def __init__(self, pubsub: PubSub | None = None) -> None:
         self.user_sockets: Dict[str, Set[WebSocket]] = {}
         self.room_sockets: Dict[str, Set[WebSocket]] = {}
+        self.writers: Dict[WebSocket, SocketWriter] = {}
+        # Room subscriptions follow local sockets joining/leaving rooms
+        self.pubsub = pubsub
+
+    def report_metrics(self) -> None:
+        """Outbound queue depth across this node's sockets, collected when metrics are scraped"""
+        depths = [len(writer.frames) for writer in self.writers.values()]
+        metrics.set_gauge("ws_sockets", len(depths))
+        metrics.set_gauge("ws_outbound_queue_depth_max", max(depths, default=0))
+        metrics.set_gauge("ws_outbound_queue_depth_total", sum(depths))
+        metrics.set_gauge(
+            "ws_outbound_queue_backlogged",
+            sum(1 for depth in depths if depth >= settings.WS_SEND_QUEUE_SIZE // 2)
+        )
 
     async def accept(self, ws: WebSocket) -> None:
         await ws.accept()
 
     def track_user(self, user_id: str, ws: WebSocket) -> None:
         self.user_sockets.setdefault(user_id, set()).add(ws)
+        self.writers[ws] = SocketWriter(ws, user_id)
+
+    async def untrack(self, user_id: str, ws: WebSocket) -> None:
+        sockets = self.user_sockets.get(user_id, set())
+        sockets.discard(ws)
+        if not sockets:
+            self.user_sockets.pop(user_id, None)
+        writer = self.writers.pop(ws, None)
+        if writer:
+            writer.close()
+        for room in [room for room, members in self.room_sockets.items() if ws in members]:
+            await self.leave_room(room, ws)
+
+    def touch(self, ws: WebSocket) -> None:
+        """Any inbound frame proves the connection is alive"""
+        writer = self.writers.get(ws)
+        if writer:
+            writer.last_seen = time.monotonic()
+
+    def idle_sockets(self, idle_for: float) -> list[tuple[str, WebSocket]]:
+        """(user_id, ws) for sockets silent for idle_for seconds or whose writer died"""
+        cutoff = time.monotonic() - idle_for
+        return [
+            (writer.user_id, ws)
+            for ws, writer in self.writers.items()
+            if writer.closed or writer.last_seen < cutoff
+        ]
+
+    async def join_room(self, room_id: str, ws: WebSocket) -> None:
+        sockets = self.room_sockets.setdefault(room_id, set())
+        if ws in sockets:
+            return
+        sockets.add(ws)
+        if self.pubsub:
+            await self.pubsub.subscribe_room(room_id)
+
+    async def leave_room(self, room_id: str, ws: WebSocket) -> None:
+        sockets = self.room_sockets.get(room_id)
+        if not sockets or ws not in sockets:
+            return
+        sockets.discard(ws)
+        if not sockets:
+            self.room_sockets.pop(room_id, None)
+        if self.pubsub:
+            await self.pubsub.unsubscribe_room(room_id)
+
+    def _enqueue(self, sockets: Iterable[WebSocket], payload: dict | Frame) -> int:
+        # Encoded once here, whatever the number of recipients
+        frame = encode_frame(payload)
+        queued = 0
+        for ws in sockets:
+            writer = self.writers.get(ws)
+            if writer and writer.enqueue(frame):
+                queued += 1
+        return queued
+
+    def send(self, ws: WebSocket, payload: dict | Frame) -> bool:
+        """Queue a frame for one socket, in order with everything else sent to it"""
+        return self._enqueue((ws,), payload) == 1
+
+    def broadcast_room(self, room_id: str, payload: dict | Frame) -> int:
+        return self._enqueue(list(self.room_sockets.get(room_id, ())), payload)
+
+    def send_user(self, user_id: str, payload: dict | Frame) -> int:
+        return self._enqueue(list(self.user_sockets.get(user_id, ())), payload)
 
-    def untrack(self, user_id: str, ws: WebSocket) -> None:
-        self.user_sockets.get(user_id, set()).discard(ws)
-        for room in list(self.room_sockets.keys()):
-            self.room_sockets[room].discard(ws)
-            if not self.room_sockets[room]:
-                self.room_sockets.pop(room, None)
-
-    def join_room(self, room_id: str, ws: WebSocket) -> None:
-        self.room_sockets.setdefault(room_id, set()).add(ws)
-
-    async def broadcast_room(self, room_id: str, payload: dict) -> None:
-        for ws in list(self.room_sockets.get(room_id, set())):
-            try:
-                await ws.send_json(payload)
-            except Exception:
-                pass
-
-    async def send_user(self, user_id: str, payload: dict) -> None:
-        for ws in list(self.user_sockets.get(user_id, set())):
-            try:
-                await ws.send_json(payload)
-            except Exception:
-                pass
+    def send_users(self, user_ids: Iterable[str], payload: dict | Frame) -> int:
+        sockets = [ws for user_id in user_ids for ws in self.user_sockets.get(user_id, ())]
+        return self._enqueue(sockets, payload)
@@ -0,0 +1,154 @@
+# backend/app/websocket/membership.py
+
+import asyncio
+import uuid
+from typing import Awaitable, Callable, Hashable, Iterable
+from redis.asyncio import Redis
+from sqlalchemy import select
+
+from app.config.settings import settings
+from app.core import metrics
+from app.core.cache import MISSING, TTLCache, listen_for_invalidations
+from app.core.serialization import dumps, loads
+from app.db.session import async_session_maker
+from app.models.conversation_member import ConversationMember
+
+INVALIDATE_CHANNEL = "papyris:membership:invalidate"
+
+
+class MembershipCache:
+    """
+    Conversation membership for WebSocket authorization and fan-out.
+
+    Caches (user, conversation) membership checks and each conversation's
+    member-ID list, bounded by MEMBERSHIP_CACHE_SIZE entries and
+    MEMBERSHIP_CACHE_TTL seconds. Code that changes membership calls
+    publish_invalidation, which drops the entries on every node through a
+    Redis channel; the TTL bounds staleness if a message is missed.
+    """
+
+    def __init__(self) -> None:
+        self.redis = Redis.from_url(settings.redis_dsn, decode_responses=True)
+        self._checks = TTLCache(settings.MEMBERSHIP_CACHE_SIZE, settings.MEMBERSHIP_CACHE_TTL)
+        self._members = TTLCache(settings.MEMBERSHIP_CACHE_SIZE, settings.MEMBERSHIP_CACHE_TTL)
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self._generation = 0  # bumped by every invalidation
+        self._task: asyncio.Task | None = None
+
+    async def _load(self, cache: TTLCache, key: Hashable, loader: Callable[[], Awaitable]):
+        value = cache.get(key)
+        if value is not MISSING:
+            metrics.inc("membership_cache_hits")
+            return value
+        metrics.inc("membership_cache_misses")
+
+        # Concurrent misses for the same key share one query
+        inflight = self._inflight.get(key)
+        if inflight:
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise  # this waiter was cancelled
+                return await self._load(cache, key, loader)  # the loading task was; load again
+
+        generation = self._generation
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+            # Don't cache a result an invalidation may have overtaken
+            if generation == self._generation:
+                cache.set(key, value)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # waiters re-raise it; don't log it as unretrieved
+            raise
+        finally:
+            self._inflight.pop(key, None)
+            if not future.done():
+                future.cancel()  # the load was cancelled; wake the waiters
+
+    async def is_member(self, user_id: str, conversation_id: str) -> bool:
+        members = self._members.get(conversation_id)
+        if members is not MISSING:
+            metrics.inc("membership_cache_hits")
+            return user_id in members
+        try:
+            user_uuid, conv_uuid = uuid.UUID(user_id), uuid.UUID(conversation_id)
+        except ValueError:
+            return False
+
+        async def query() -> bool:
+            async with async_session_maker() as db:
+                result = await db.execute(
+                    select(ConversationMember.user_id).where(
+                        ConversationMember.conversation_id == conv_uuid,
+                        ConversationMember.user_id == user_uuid
+                    )
+                )
+                return result.first() is not None
+
+        return await self._load(self._checks, (user_id, conversation_id), query)
+
+    async def member_ids(self, conversation_id: str) -> frozenset[str]:
+        conv_uuid = uuid.UUID(conversation_id)
+
+        async def query() -> frozenset[str]:
+            async with async_session_maker() as db:
+                result = await db.execute(
+                    select(ConversationMember.user_id).where(
+                        ConversationMember.conversation_id == conv_uuid
+                    )
+                )
+                return frozenset(str(uid) for uid in result.scalars().all())
+
+        return await self._load(self._members, conversation_id, query)
+
+    def invalidate(self, conversation_id: str, user_ids: Iterable[str] = ()) -> None:
+        """Drop this node's entries for a conversation"""
+        self._generation += 1
+        self._members.pop(conversation_id)
+        for user_id in user_ids:
+            self._checks.pop((str(user_id), conversation_id))
+
+    async def publish_invalidation(self, conversation_id, user_ids: Iterable = ()) -> None:
+        """Call after committing a membership change; reaches every node"""
+        conversation_id, user_ids = str(conversation_id), [str(u) for u in user_ids]
+        self.invalidate(conversation_id, user_ids)
+        try:
+            await self.redis.publish(
+                INVALIDATE_CHANNEL, dumps({"conversationId": conversation_id, "userIds": user_ids})
+            )
+        except Exception as e:
+            print(f"❌ Membership invalidation publish failed: {e}")
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._checks.clear()
+        self._members.clear()
+
+    async def _on_invalidation(self, message: str) -> None:
+        data = loads(message)
+        self.invalidate(data["conversationId"], data.get("userIds", ()))
+
+    async def _on_reconnect(self) -> None:
+        self.clear()  # invalidations may have been missed
+
+    async def run(self) -> None:
+        await listen_for_invalidations(
+            self.redis, INVALIDATE_CHANNEL, self._on_invalidation, self._on_reconnect, "membership"
+        )
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+        await self.redis.close()
+
+
+membership = MembershipCache()
@@ -0,0 +1,191 @@
+# backend/app/websocket/presence.py
+
+import asyncio
+import uuid
+from typing import Awaitable, Callable, Dict, Iterable, Set
+from redis.asyncio import Redis
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+from app.config.settings import settings
+from app.db.session import async_session_maker
+from app.models.conversation_member import ConversationMember
+
+ONLINE_SET_KEY = "papyris:online_users"
+HEARTBEAT_KEY = "papyris:presence:hb:{user_id}"
+SUBSCRIBERS_KEY = "papyris:presence:subs:{user_id}"
+
+Deliver = Callable[[list[str], dict], Awaitable[int]]
+
+
+def heartbeat_key(user_id: str) -> str:
+    return HEARTBEAT_KEY.format(user_id=user_id)
+
+
+def subscribers_key(user_id: str) -> str:
+    return SUBSCRIBERS_KEY.format(user_id=user_id)
+
+
+class PresenceService:
+    """
+    Online state and interest-scoped presence updates.
+
+    A user is online while they are in the online set and their heartbeat
+    key (refreshed by client pings) has not expired. State changes are
+    collected and flushed every PRESENCE_FLUSH_INTERVAL_MS as one diff
+    frame per recipient, sent only to users who share a conversation with
+    the subject or subscribed to them explicitly - never to everyone.
+    """
+
+    def __init__(self) -> None:
+        self.redis = Redis.from_url(settings.redis_dsn, decode_responses=True)
+        self._changes: Dict[str, bool] = {}  # user_id -> online, since the last flush
+        self._touched: Set[str] = set()
+        self._subscriptions: Dict[str, Set[str]] = {}  # local subscriber -> subjects
+        self._deliver: Deliver | None = None
+        self._task: asyncio.Task | None = None
+
+    def _record(self, user_id: str, online: bool) -> None:
+        if user_id in self._changes and self._changes[user_id] != online:
+            # Flipped back within one window - nothing to announce
+            del self._changes[user_id]
+        else:
+            self._changes[user_id] = online
+
+    async def connect(self, user_id: str) -> None:
+        """The user now has a socket somewhere"""
+        async with self.redis.pipeline(transaction=False) as p:
+            await p.sadd(ONLINE_SET_KEY, user_id)
+            await p.set(heartbeat_key(user_id), 1, ex=settings.PRESENCE_TTL)
+            added, _ = await p.execute()
+        if added:
+            self._record(user_id, True)
+
+    async def disconnect(self, user_id: str) -> None:
+        """No node holds a socket for the user any more"""
+        async with self.redis.pipeline(transaction=False) as p:
+            await p.srem(ONLINE_SET_KEY, user_id)
+            await p.delete(heartbeat_key(user_id))
+            removed, _ = await p.execute()
+        if removed:
+            self._record(user_id, False)
+
+    def touch(self, user_id: str) -> None:
+        """Client heartbeat; the TTL refresh is batched into the next flush"""
+        self._touched.add(user_id)
+
+    async def online_among(self, user_ids: Iterable[str]) -> Set[str]:
+        """Which of these users are online, in one round trip"""
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return set()
+        async with self.redis.pipeline(transaction=False) as p:
+            await p.smismember(ONLINE_SET_KEY, user_ids)
+            await p.mget([heartbeat_key(user_id) for user_id in user_ids])
+            members, beats = await p.execute()
+        return {
+            user_id
+            for user_id, member, beat in zip(user_ids, members, beats)
+            if member and beat
+        }
+
+    async def subscribe(self, subscriber_id: str, user_ids: Iterable[str]) -> Set[str]:
+        """Follow presence of users outside the subscriber's conversations; returns who is online"""
+        subjects = set(list(user_ids)[:settings.PRESENCE_MAX_SUBSCRIPTIONS])
+        if subjects:
+            async with self.redis.pipeline(transaction=False) as p:
+                for subject in subjects:
+                    await p.sadd(subscribers_key(subject), subscriber_id)
+                await p.execute()
+            self._subscriptions.setdefault(subscriber_id, set()).update(subjects)
+        return await self.online_among(subjects)
+
+    async def unsubscribe_all(self, subscriber_id: str) -> None:
+        subjects = self._subscriptions.pop(subscriber_id, set())
+        if not subjects:
+            return
+        async with self.redis.pipeline(transaction=False) as p:
+            for subject in subjects:
+                await p.srem(subscribers_key(subject), subscriber_id)
+            await p.execute()
+
+    async def _watchers(self, subjects: list[str]) -> Dict[str, Set[str]]:
+        """recipient -> subjects whose change they should hear about"""
+        me = aliased(ConversationMember)
+        peer = aliased(ConversationMember)
+        stmt = (
+            select(me.user_id, peer.user_id)
+            .join(peer, peer.conversation_id == me.conversation_id)
+            .where(
+                me.user_id.in_([uuid.UUID(s) for s in subjects]),
+                peer.user_id != me.user_id,
+            )
+            .distinct()
+        )
+        async with async_session_maker() as db:
+            rows = (await db.execute(stmt)).all()
+
+        watchers: Dict[str, Set[str]] = {}
+        for subject, watcher in rows:
+            watchers.setdefault(str(watcher), set()).add(str(subject))
+
+        async with self.redis.pipeline(transaction=False) as p:
+            for subject in subjects:
+                await p.smembers(subscribers_key(subject))
+            subscribers = await p.execute()
+        for subject, watcher_ids in zip(subjects, subscribers):
+            for watcher in watcher_ids:
+                watchers.setdefault(watcher, set()).add(subject)
+        return watchers
+
+    async def flush(self) -> None:
+        if self._touched:
+            touched, self._touched = self._touched, set()
+            async with self.redis.pipeline(transaction=False) as p:
+                for user_id in touched:
+                    await p.set(heartbeat_key(user_id), 1, ex=settings.PRESENCE_TTL)
+                await p.execute()
+
+        if not self._changes or not self._deliver:
+            return
+        changes, self._changes = self._changes, {}
+
+        try:
+            watchers = await self._watchers(list(changes))
+        except Exception:
+            # Retry on the next flush; newer changes win
+            self._changes = {**changes, **self._changes}
+            raise
+
+        # Recipients with the same set of subjects get the same frame
+        groups: Dict[frozenset, list[str]] = {}
+        for watcher, subjects in watchers.items():
+            groups.setdefault(frozenset(subjects), []).append(watcher)
+
+        for subjects, recipients in groups.items():
+            await self._deliver(recipients, {
+                "type": "presence",
+                "online": sorted(s for s in subjects if changes[s]),
+                "offline": sorted(s for s in subjects if not changes[s]),
+            })
+
+    async def run(self) -> None:
+        interval = settings.PRESENCE_FLUSH_INTERVAL_MS / 1000
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"❌ Presence flush error: {e}")
+
+    def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+        await self.redis.close()
+
+
+presence = PresenceService()
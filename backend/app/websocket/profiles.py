@@ -0,0 +1,79 @@
+# backend/app/websocket/profiles.py
+
+import asyncio
+import uuid
+from redis.asyncio import Redis
+from sqlalchemy import select
+
+from app.config.settings import settings
+from app.core.cache import listen_for_invalidations
+from app.db.session import async_session_maker
+from app.models.user import User
+
+PROFILE_CHANNEL = "papyris:profile:changed"
+
+UNKNOWN_PROFILE = {"name": "Unknown", "avatar": None}
+
+
+class ProfileCache:
+    """
+    Display profile (name, avatar) of the users connected to this node.
+
+    Loaded once when a user's first socket connects and kept while they
+    have local sockets, so sending a message needs no user lookup. Code
+    that changes a user's name or avatar calls user_cache.publish_change
+    (app.core.user_cache), and every node holding that user reloads it.
+    """
+
+    def __init__(self) -> None:
+        self.redis = Redis.from_url(settings.redis_dsn, decode_responses=True)
+        self._profiles: dict[str, dict] = {}
+        self._task: asyncio.Task | None = None
+
+    async def _fetch(self, user_id: str) -> dict:
+        async with async_session_maker() as db:
+            result = await db.execute(
+                select(User.username, User.avatar).where(User.id == uuid.UUID(user_id))
+            )
+            row = result.first()
+        if not row:
+            return UNKNOWN_PROFILE
+        return {"name": row.username, "avatar": row.avatar}
+
+    async def load(self, user_id: str) -> dict:
+        if user_id not in self._profiles:
+            self._profiles[user_id] = await self._fetch(user_id)
+        return self._profiles[user_id]
+
+    def get(self, user_id: str) -> dict:
+        return self._profiles.get(user_id, UNKNOWN_PROFILE)
+
+    def forget(self, user_id: str) -> None:
+        self._profiles.pop(user_id, None)
+
+    async def _reload(self, user_id: str) -> None:
+        if user_id in self._profiles:
+            try:
+                self._profiles[user_id] = await self._fetch(user_id)
+            except Exception as e:
+                print(f"❌ Profile reload failed for {user_id[:8]}: {e}")
+
+    async def _reload_all(self) -> None:
+        for user_id in list(self._profiles):
+            await self._reload(user_id)  # changes may have been missed
+
+    async def run(self) -> None:
+        await listen_for_invalidations(
+            self.redis, PROFILE_CHANNEL, self._reload, self._reload_all, "profile"
+        )
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+        await self.redis.close()
+
+
+profiles = ProfileCache()
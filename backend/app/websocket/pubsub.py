@@ -1,30 +1,119 @@
-import json
 import asyncio
+from typing import Dict, Iterable
 from redis.asyncio import Redis
 from app.config.settings import settings
+from app.core.serialization import dumps, loads
+from app.websocket.registry import NODE_ID
+
+CHANNEL = "papyris:ws:events"  # node-wide events (presence)
+ROOM_CHANNEL_PREFIX = "papyris:ws:room:"
+NODE_CHANNEL_PREFIX = "papyris:ws:node:"
+
+
+def room_channel(room_id: str) -> str:
+    return f"{ROOM_CHANNEL_PREFIX}{room_id}"
+
+
+def node_channel(node_id: str) -> str:
+    return f"{NODE_CHANNEL_PREFIX}{node_id}"
 
-CHANNEL = "papyris:ws:events"
 
 class PubSub:
+    """
+    Redis Pub/Sub fan-out between API nodes.
+
+    Room events go to one channel per room, and a node only subscribes to
+    the rooms its local sockets have joined, so each node parses traffic
+    proportional to its own interest instead of every event in the system.
+    Direct messages to users go to the channel of each node hosting them.
+    """
+
     def __init__(self) -> None:
         self.redis = Redis.from_url(settings.redis_dsn, decode_responses=True)
+        self._pubsub = self.redis.pubsub()
         self._task: asyncio.Task | None = None
+        self._room_refs: Dict[str, int] = {}
+        self._pending_unsubscribe: Dict[str, asyncio.TimerHandle] = {}
+
+    def _channel_for(self, payload: dict) -> str:
+        room_id = payload.get("roomId")
+        return room_channel(room_id) if room_id else CHANNEL
 
     async def publish(self, payload: dict) -> None:
-        await self.redis.publish(CHANNEL, json.dumps(payload))
+        await self.redis.publish(self._channel_for(payload), dumps(payload))
+
+    async def publish_many(self, payloads: list[dict]) -> None:
+        """Publish several events in one round trip"""
+        async with self.redis.pipeline(transaction=False) as p:
+            for payload in payloads:
+                await p.publish(self._channel_for(payload), dumps(payload))
+            await p.execute()
+
+    async def publish_to_nodes(self, users_by_node: Dict[str, Iterable[str]], payload_json: str) -> None:
+        """
+        Send an already-encoded payload for specific users to the nodes hosting
+        them, one pipeline for all nodes. The payload is spliced into each
+        envelope as-is instead of being re-encoded per node.
+        """
+        if not users_by_node:
+            return
+        async with self.redis.pipeline(transaction=False) as p:
+            for node_id, user_ids in users_by_node.items():
+                envelope = f'{{"userIds":{dumps(list(user_ids))},"payload":{payload_json}}}'
+                await p.publish(node_channel(node_id), envelope)
+            await p.execute()
+
+    async def subscribe_room(self, room_id: str) -> None:
+        """Reference-counted: the first local socket in a room subscribes the node"""
+        self._room_refs[room_id] = self._room_refs.get(room_id, 0) + 1
+
+        pending = self._pending_unsubscribe.pop(room_id, None)
+        if pending:
+            # Rejoined during the grace period - still subscribed
+            pending.cancel()
+            return
+
+        if self._room_refs[room_id] == 1:
+            await self._pubsub.subscribe(room_channel(room_id))
+
+    async def unsubscribe_room(self, room_id: str) -> None:
+        """The last local socket leaving schedules an unsubscribe after a grace period"""
+        refs = self._room_refs.get(room_id, 0) - 1
+        if refs > 0:
+            self._room_refs[room_id] = refs
+            return
+        if self._room_refs.pop(room_id, None) is None:
+            return
+
+        # Linger so leave/join churn (tab switches, reconnects) doesn't thrash Redis
+        loop = asyncio.get_running_loop()
+        self._pending_unsubscribe[room_id] = loop.call_later(
+            settings.WS_ROOM_UNSUBSCRIBE_GRACE,
+            lambda: asyncio.create_task(self._drop_room(room_id)),
+        )
+
+    async def _drop_room(self, room_id: str) -> None:
+        self._pending_unsubscribe.pop(room_id, None)
+        if room_id not in self._room_refs:
+            await self._pubsub.unsubscribe(room_channel(room_id))
 
     async def run(self, on_event):
-        pubsub = self.redis.pubsub()
-        await pubsub.subscribe(CHANNEL)
-        async for msg in pubsub.listen():
+        await self._pubsub.subscribe(CHANNEL, node_channel(NODE_ID))
+        async for msg in self._pubsub.listen():
             if msg["type"] != "message":
                 continue
-            data = json.loads(msg["data"])
-            await on_event(data)
+            # A bad message or handler error must not end the node's only listener
+            try:
+                await on_event(loads(msg["data"]))
+            except Exception as e:
+                print(f"❌ [PubSub] Failed to handle message on {msg.get('channel')}: {e}")
 
     def start(self, on_event):
         self._task = asyncio.create_task(self.run(on_event))
 
     async def stop(self):
+        for pending in self._pending_unsubscribe.values():
+            pending.cancel()
+        self._pending_unsubscribe.clear()
         if self._task:
             self._task.cancel()
@@ -0,0 +1,190 @@
+# backend/app/websocket/receipts.py
+
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from typing import Awaitable, Callable
+from sqlalchemy import select, func, or_, bindparam, case, tuple_
+
+from app.config.settings import settings
+from app.core import metrics
+from app.db.session import async_session_maker
+from app.models.conversation_member import ConversationMember
+from app.models.message import Message
+
+Publish = Callable[[list[dict]], Awaitable[None]]
+
+
+class ReadReceiptBuffer:
+    """
+    Batches "read" events into periodic writes.
+
+    Read events only record the latest message ID per (user, conversation);
+    a client reports reads in order, and the write never moves a watermark
+    backwards. Every READ_RECEIPT_FLUSH_INTERVAL_MS the buffer writes all
+    pairs with one executemany update of the members' read watermarks and
+    unread counters; no per-message receipt rows are stored. The "read"
+    notifications go out after the commit, once per pair rather than once
+    per event.
+
+    A read can arrive before the worker has persisted its message; such
+    pairs are kept for up to READ_RECEIPT_MAX_ATTEMPTS flushes.
+    """
+
+    def __init__(self) -> None:
+        self._pending: dict[tuple[str, str], tuple[str, int]] = {}  # (user, conversation) -> (message ID, attempts)
+        self._publish: Publish | None = None
+        self._task: asyncio.Task | None = None
+
+    def add(self, user_id: str, conversation_id: str, message_id: str) -> None:
+        try:
+            uuid.UUID(message_id)
+        except ValueError:
+            return
+        metrics.inc("read_events_received")
+        self._pending[(user_id, conversation_id)] = (message_id, 0)
+
+    async def _persist(self, db, pending: dict[tuple[str, str], tuple[str, int]]) -> tuple[list[tuple], list]:
+        """
+        Returns (user_id, conversation_id, message_id) for every watermark
+        written, and the pairs whose message is not persisted yet
+        """
+        message_ids = {uuid.UUID(message_id) for message_id, _ in pending.values()}
+        result = await db.execute(
+            select(Message.id, Message.conversation_id, Message.created_at).where(Message.id.in_(message_ids))
+        )
+        found = {row.id: row for row in result}
+
+        # Ignore IDs from other conversations
+        reads, missing = [], []
+        for (user_id, conversation_id), (message_id, _) in pending.items():
+            msg = found.get(uuid.UUID(message_id))
+            if msg is None:
+                missing.append((user_id, conversation_id))
+            elif str(msg.conversation_id) == conversation_id:
+                reads.append((uuid.UUID(user_id), msg))
+        if not reads:
+            return [], missing
+
+        # ✅ Move read watermarks forward only, and recount what is still unread
+        members = ConversationMember.__table__
+        messages = Message.__table__
+        position = tuple_(bindparam("b_created_at"), bindparam("b_message_id"))
+        read = tuple_(members.c.last_read_message_at, members.c.last_read_message_id)
+        delivered = tuple_(members.c.last_delivered_message_at, members.c.last_delivered_message_id)
+        delivered_behind = or_(
+            members.c.last_delivered_message_at.is_(None),
+            members.c.last_delivered_message_id.is_(None),
+            delivered < position
+        )
+        newer_count = (
+            select(func.count(messages.c.id))
+            .where(
+                messages.c.conversation_id == bindparam("b_conversation_id"),
+                messages.c.sender_id != bindparam("b_user_id"),
+                messages.c.created_at > bindparam("b_created_at")
+            )
+            .scalar_subquery()
+        )
+        now = datetime.now(timezone.utc)
+        await db.execute(
+            members.update()
+            .where(
+                members.c.conversation_id == bindparam("b_conversation_id"),
+                members.c.user_id == bindparam("b_user_id"),
+                or_(
+                    members.c.last_read_message_at.is_(None),
+                    members.c.last_read_message_id.is_(None),
+                    read <= position
+                )
+            )
+            .values(
+                last_read_message_id=bindparam("b_message_id"),
+                last_read_message_at=bindparam("b_created_at"),
+                last_read_at=bindparam("b_read_at"),
+                unread_count=newer_count,
+                # Whatever was read has been delivered
+                last_delivered_message_id=case(
+                    (delivered_behind, bindparam("b_message_id")),
+                    else_=members.c.last_delivered_message_id
+                ),
+                last_delivered_message_at=case(
+                    (delivered_behind, bindparam("b_created_at")),
+                    else_=members.c.last_delivered_message_at
+                )
+            ),
+            [
+                {
+                    "b_conversation_id": msg.conversation_id,
+                    "b_user_id": user_id,
+                    "b_message_id": msg.id,
+                    "b_created_at": msg.created_at,
+                    "b_read_at": now,
+                }
+                for user_id, msg in reads
+            ]
+        )
+        await db.commit()
+        return [(str(user_id), str(msg.conversation_id), str(msg.id)) for user_id, msg in reads], missing
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+
+        try:
+            async with async_session_maker() as db:
+                reads, missing = await self._persist(db, pending)
+        except Exception:
+            # Keep them for the next flush, unless a newer read arrived meanwhile
+            for key, entry in pending.items():
+                self._pending.setdefault(key, entry)
+            raise
+
+        # Messages still in the stream: try again on the next flushes
+        for key in missing:
+            message_id, attempts = pending[key]
+            if attempts + 1 < settings.READ_RECEIPT_MAX_ATTEMPTS:
+                self._pending.setdefault(key, (message_id, attempts + 1))
+            else:
+                metrics.inc("read_receipts_dropped")
+
+        metrics.inc("read_receipt_flushes")
+        metrics.inc("read_receipts_written", len(reads))
+        if reads and self._publish:
+            await self._publish([
+                {
+                    "roomId": conversation_id,
+                    "payload": {
+                        "type": "read",
+                        "roomId": conversation_id,
+                        "userId": user_id,
+                        "lastMessageId": message_id
+                    }
+                }
+                for user_id, conversation_id, message_id in reads
+            ])
+
+    async def run(self) -> None:
+        interval = settings.READ_RECEIPT_FLUSH_INTERVAL_MS / 1000
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"❌ Read receipt flush error: {e}")
+
+    def start(self, publish: Publish) -> None:
+        self._publish = publish
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"❌ Final read receipt flush failed: {e}")
+
+
+read_receipts = ReadReceiptBuffer()
@@ -0,0 +1,121 @@
+import os
+import socket
+import uuid
+from typing import Dict, Iterable, Set
+from redis.asyncio import Redis
+from app.config.settings import settings
+
+# Identifies this API process; every uvicorn worker gets its own
+NODE_ID = settings.WS_NODE_ID or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+USER_NODES_KEY = "papyris:ws:user:{user_id}:nodes"
+NODES_KEY = "papyris:ws:nodes"
+NODE_USERS_KEY = "papyris:ws:node:{node_id}:users"
+NODE_LEASE_KEY = "papyris:ws:node:{node_id}:lease"
+NODE_SWEEP_KEY = "papyris:ws:node:{node_id}:sweep"
+
+
+def user_nodes_key(user_id: str) -> str:
+    return USER_NODES_KEY.format(user_id=user_id)
+
+
+def node_users_key(node_id: str) -> str:
+    return NODE_USERS_KEY.format(node_id=node_id)
+
+
+def node_lease_key(node_id: str) -> str:
+    return NODE_LEASE_KEY.format(node_id=node_id)
+
+
+class ConnectionRegistry:
+    """
+    Redis-backed map of which nodes hold sockets for which users.
+
+    A node registers a user when it accepts that user's first local socket
+    and unregisters on the last one, so senders can publish a message only
+    to the nodes that actually host its recipients.
+
+    Each node also holds a lease key that it renews every heartbeat. If a
+    node dies without running its cleanup, its lease expires and any other
+    node sweeps its users out of the registry.
+    """
+
+    def __init__(self) -> None:
+        self.redis = Redis.from_url(settings.redis_dsn, decode_responses=True)
+
+    async def register(self, user_id: str) -> None:
+        async with self.redis.pipeline(transaction=True) as p:
+            await p.sadd(user_nodes_key(user_id), NODE_ID)
+            await p.sadd(node_users_key(NODE_ID), user_id)
+            await p.execute()
+
+    async def unregister(self, user_id: str, node_id: str = NODE_ID) -> int:
+        """Remove the node for the user; returns how many nodes still hold the user"""
+        async with self.redis.pipeline(transaction=True) as p:
+            await p.srem(user_nodes_key(user_id), node_id)
+            await p.srem(node_users_key(node_id), user_id)
+            await p.scard(user_nodes_key(user_id))
+            _, _, remaining = await p.execute()
+        return remaining
+
+    async def renew_lease(self) -> bool:
+        """True if the node was (re)added - at startup, or after being swept by mistake"""
+        async with self.redis.pipeline(transaction=False) as p:
+            await p.set(node_lease_key(NODE_ID), 1, ex=settings.WS_NODE_LEASE_TTL)
+            await p.sadd(NODES_KEY, NODE_ID)
+            _, added = await p.execute()
+        return bool(added)
+
+    async def release_lease(self) -> None:
+        """Clean shutdown: hand our users to the next sweep right away"""
+        await self.redis.delete(node_lease_key(NODE_ID))
+
+    async def dead_nodes(self) -> list[str]:
+        node_ids = [n for n in await self.redis.smembers(NODES_KEY) if n != NODE_ID]
+        if not node_ids:
+            return []
+        async with self.redis.pipeline(transaction=False) as p:
+            for node_id in node_ids:
+                await p.exists(node_lease_key(node_id))
+            alive = await p.execute()
+        return [node_id for node_id, exists in zip(node_ids, alive) if not exists]
+
+    async def sweep_node(self, node_id: str) -> list[str]:
+        """
+        Drop a dead node from the registry. Returns the users it held that
+        no other node holds, i.e. who are now offline. Only one node sweeps
+        a given dead node at a time.
+        """
+        lock = NODE_SWEEP_KEY.format(node_id=node_id)
+        if not await self.redis.set(lock, NODE_ID, nx=True, ex=60):
+            return []
+
+        offline = []
+        for user_id in await self.redis.smembers(node_users_key(node_id)):
+            if await self.unregister(user_id, node_id) == 0:
+                offline.append(user_id)
+
+        async with self.redis.pipeline(transaction=False) as p:
+            await p.delete(node_users_key(node_id))
+            await p.srem(NODES_KEY, node_id)
+            await p.execute()
+        return offline
+
+    async def nodes_for(self, user_ids: Iterable[str]) -> Dict[str, Set[str]]:
+        """node_id -> user IDs hosted there, in one pipelined round trip"""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        async with self.redis.pipeline(transaction=False) as p:
+            for user_id in user_ids:
+                await p.smembers(user_nodes_key(user_id))
+            results = await p.execute()
+
+        by_node: Dict[str, Set[str]] = {}
+        for user_id, node_ids in zip(user_ids, results):
+            for node_id in node_ids:
+                by_node.setdefault(node_id, set()).add(user_id)
+        return by_node
+
+    async def close(self) -> None:
+        await self.redis.close()
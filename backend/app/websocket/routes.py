@@ -1,38 +1,53 @@
 # backend/app/websocket/routes.py
 
-import json
 import uuid
+import asyncio
 import logging
 from datetime import datetime, timezone
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 
-from app.db.session import async_session_maker
-from app.websocket.manager import WSManager
+from app.config.settings import settings
+from app.core import metrics
+from app.core.serialization import loads
+from app.websocket.manager import WSManager, encode_frame
 from app.websocket.auth import get_token_from_ws, verify_ws_token 
+from app.websocket.membership import membership
+from app.websocket.presence import presence
+from app.websocket.receipts import read_receipts
+from app.websocket.profiles import profiles
 from app.websocket.pubsub import PubSub
+from app.websocket.registry import ConnectionRegistry, NODE_ID
 from app.websocket.streams import RedisStreams
-from app.models.message import Message
-from app.models.message_receipt import MessageReceipt
-from app.models.conversation_member import ConversationMember
-from app.models.user import User
+from app.websocket.typing_indicators import typing_coalescer
 
 router = APIRouter(prefix="/ws", tags=["WebSocket"])
 
 logger = logging.getLogger(__name__)
 
 # Initialize services
-manager = WSManager()
 pubsub = PubSub()
+manager = WSManager(pubsub)
 streams = RedisStreams()
+registry = ConnectionRegistry()
+metrics.register_collector(manager.report_metrics)
+_heartbeat_task: asyncio.Task | None = None
+_close_tasks: set[asyncio.Task] = set()  # idle-timeout closes in flight
 
-ONLINE_SET_KEY = "papyris:online_users"
 
+async def deliver_to_users(user_ids: list[str], payload: dict) -> int:
+    """
+    Deliver a payload to users wherever they are connected.
 
-async def publish_room(room_id: str, payload: dict):
-    """Publish event to a room via Redis Pub/Sub"""
-    await pubsub.publish({"roomId": room_id, "payload": payload})
+    Local sockets are written directly; other nodes only get a publish if
+    the connection registry says they host one of the users.
+    """
+    frame = encode_frame(payload)
+    sent_count = manager.send_users(user_ids, frame)
+
+    users_by_node = await registry.nodes_for(user_ids)
+    users_by_node.pop(NODE_ID, None)
+    await pubsub.publish_to_nodes(users_by_node, frame.text)
+    return sent_count
 
 
 async def on_redis_event(evt: dict):
@@ -40,36 +55,117 @@ async def on_redis_event(evt: dict):
     room_id = evt.get("roomId")
     payload = evt.get("payload")
 
+    # ✅ Typing state from a node; merged and sent on the next typing flush
+    if "typing" in evt:
+        typing_coalescer.merge(room_id, evt["typing"]["node"], evt["typing"]["userIds"])
+        return
+
     if not payload:
         return
 
-    # ✅ Handle global events (presence)
-    if room_id == "__global__":
-        # Broadcast to ALL connected users
-        for user_id, ws_set in manager.user_sockets.items():
-            for ws in ws_set:
-                try:
-                    await ws.send_json(payload)
-                except Exception as e:
-                    print(f"❌ Failed to send global event to {user_id}: {e}")
-    elif room_id:
-        # Regular room broadcast
-        await manager.broadcast_room(room_id, payload)
+    # ✅ Handle events addressed to users on this node
+    if "userIds" in evt:
+        manager.send_users(evt["userIds"], payload)
+        return
+
+    # ✅ Regular room broadcast
+    if room_id:
+        manager.broadcast_room(room_id, payload)
+
+
+async def _release_socket(user_id: str, ws: WebSocket) -> None:
+    """Forget a socket; a user's last socket on any node takes them offline"""
+    if ws not in manager.writers:
+        return  # already released (e.g. reaped before its handler exited)
+    await manager.untrack(user_id, ws)
+    if user_id not in manager.user_sockets:
+        profiles.forget(user_id)
+        typing_coalescer.forget_user(user_id)
+        await presence.unsubscribe_all(user_id)
+        # A quick reconnect during the awaits owns the registration now
+        if user_id in manager.user_sockets:
+            return
+        remaining = await registry.unregister(user_id)
+        if user_id in manager.user_sockets:
+            await registry.register(user_id)  # reconnected while unregistering
+            return
+        # Only the last node holding the user takes them offline
+        if remaining == 0:
+            await presence.disconnect(user_id)
+            if user_id in manager.user_sockets:
+                await presence.connect(user_id)
+
+
+async def _close_quietly(ws: WebSocket, code: int, reason: str) -> None:
+    try:
+        await asyncio.wait_for(ws.close(code=code, reason=reason), timeout=5)
+    except Exception:
+        pass
+
+
+async def _heartbeat() -> None:
+    # 1. Evict sockets that have been silent past the idle timeout
+    for user_id, ws in manager.idle_sockets(settings.WS_IDLE_TIMEOUT):
+        print(f"💀 [WS:{user_id[:8]}] Evicting idle connection")
+        await _release_socket(user_id, ws)
+        task = asyncio.create_task(_close_quietly(ws, 1001, "Idle timeout"))
+        _close_tasks.add(task)
+        task.add_done_callback(_close_tasks.discard)
+
+    # 2. Ping the quiet ones; any reply refreshes them
+    for _, ws in manager.idle_sockets(settings.WS_HEARTBEAT_INTERVAL):
+        manager.send(ws, {"type": "ping"})
+
+    # 3. Keep this node's lease alive and sweep nodes whose lease expired
+    if await registry.renew_lease():
+        for user_id in list(manager.user_sockets):
+            await registry.register(user_id)
+    for node_id in await registry.dead_nodes():
+        offline = await registry.sweep_node(node_id)
+        for user_id in offline:
+            await presence.disconnect(user_id)
+        print(f"🧹 [WS] Swept dead node {node_id}: {len(offline)} user(s) offline")
+
+
+async def _heartbeat_loop() -> None:
+    while True:
+        await asyncio.sleep(settings.WS_HEARTBEAT_INTERVAL)
+        try:
+            await _heartbeat()
+        except Exception as e:
+            print(f"❌ [WS] Heartbeat error: {e}")
 
 
 @router.on_event("startup")
 async def _ws_start():
     """Initialize Redis Streams and start Pub/Sub listener"""
+    global _heartbeat_task
     await streams.init_stream()
+    await registry.renew_lease()
     pubsub.start(on_redis_event)
+    presence.start(deliver_to_users)
+    membership.start()
+    profiles.start()
+    typing_coalescer.start(pubsub.publish_many, manager.broadcast_room)
+    read_receipts.start(pubsub.publish_many)
+    _heartbeat_task = asyncio.create_task(_heartbeat_loop())
     print("✅ WebSocket services started")
 
 
 @router.on_event("shutdown")
 async def _ws_stop():
     """Cleanup on shutdown"""
+    if _heartbeat_task:
+        _heartbeat_task.cancel()
+    await registry.release_lease()
+    typing_coalescer.stop()
+    await read_receipts.stop()
     await pubsub.stop()
+    await presence.stop()
+    await membership.stop()
+    await profiles.stop()
     await streams.close()
+    await registry.close()
     print("🛑 WebSocket services stopped")
 
 
@@ -94,32 +190,28 @@ async def ws_chat(ws: WebSocket):
 
     # 2. Accept connection
     await manager.accept(ws)
+    first_socket = user_id_str not in manager.user_sockets
     manager.track_user(user_id_str, ws)
+    if first_socket:
+        await registry.register(user_id_str)
 
-    # 3. Mark user as online
-    async with pubsub.redis.pipeline() as p:
-        await p.sadd(ONLINE_SET_KEY, user_id_str)
-        await p.execute()
+    # Sender profile for the whole connection (reloaded on profile changes)
+    try:
+        await profiles.load(user_id_str)
+    except Exception as e:
+        print(f"❌ [WS:{user_id_str[:8]}] Profile load failed: {e}")
 
-    # ✅ Broadcast online to ALL users
-    online_payload = {"type": "online", "userId": user_id_str}
-    
-    # Method 1: Direct send to all (more reliable)
-    for uid, ws_set in manager.user_sockets.items():
-        for user_ws in ws_set:
-            try:
-                await user_ws.send_json(online_payload)
-                print(f"📤 Sent online status to user {uid}")
-            except Exception as e:
-                print(f"❌ Failed to send online to {uid}: {e}")
+    # 3. Mark user as online - the presence flush tells the users who care
+    await presence.connect(user_id_str)
 
-    print(f"✅ [WS] User {user_id_str[:8]} connected and broadcast to {len(manager.user_sockets)} users")
+    print(f"✅ [WS] User {user_id_str[:8]} connected")
 
     try:
         while True:
             # Receive message from client
             raw = await ws.receive_text()
-            data = json.loads(raw)
+            manager.touch(ws)
+            data = loads(raw)
             
             event_type = data.get("type")
             room_id = data.get("roomId")
@@ -128,25 +220,23 @@ async def ws_chat(ws: WebSocket):
 
             # ===== JOIN ROOM =====
             if event_type == "join" and room_id:
-                async with async_session_maker() as db:
-                    is_member = await _check_membership(db, user_id, room_id)
-                    if not is_member:
-                        print(f"⚠️  [WS:{user_id_str[:8]}] Not member of {room_id[:8]}")
-                        await ws.send_json({
-                            "type": "error",
-                            "message": "Not a member of this conversation"
-                        })
-                        continue
-                
-                manager.join_room(room_id, ws)
-                await ws.send_json({"type": "joined", "roomId": room_id})
+                if not await membership.is_member(user_id_str, room_id):
+                    print(f"⚠️  [WS:{user_id_str[:8]}] Not member of {room_id[:8]}")
+                    manager.send(ws, {
+                        "type": "error",
+                        "message": "Not a member of this conversation"
+                    })
+                    continue
+
+                await manager.join_room(room_id, ws)
+                manager.send(ws, {"type": "joined", "roomId": room_id})
                 print(f"✅ [WS:{user_id_str[:8]}] Joined room {room_id[:8]}")
                 continue
 
             # ===== LEAVE ROOM =====
             if event_type == "leave" and room_id:
-                manager.room_sockets.get(room_id, set()).discard(ws)
-                await ws.send_json({"type": "left", "roomId": room_id})
+                await manager.leave_room(room_id, ws)
+                manager.send(ws, {"type": "left", "roomId": room_id})
                 print(f"📤 [WS:{user_id_str[:8]}] Left room {room_id[:8]}")
                 continue
 
@@ -154,34 +244,30 @@ async def ws_chat(ws: WebSocket):
             if event_type == "message" and room_id:
                 text = (data.get("text") or "").strip()
                 if not text:
-                    await ws.send_json({"type": "error", "message": "Empty message"})
+                    manager.send(ws, {"type": "error", "message": "Empty message"})
                     continue
 
-                async with async_session_maker() as db:
-                    # Verify membership
-                    is_member = await _check_membership(db, user_id, room_id)
-                    if not is_member:
-                        print(f"⚠️  [WS:{user_id_str[:8]}] Can't send to {room_id[:8]} - not member")
-                        await ws.send_json({
-                            "type": "error",
-                            "message": "Not a member of this conversation"
-                        })
-                        continue
-
-                    # ✅ Get all conversation members
-                    members_stmt = select(ConversationMember.user_id).where(
-                        ConversationMember.conversation_id == uuid.UUID(room_id)
-                    )
-                    members_result = await db.execute(members_stmt)
-                    member_ids = [str(m) for m in members_result.scalars().all()]
-
-                    # Get sender info
-                    sender = await db.get(User, user_id)
-                    sender_name = sender.username if sender else "Unknown"
-                    sender_avatar = sender.avatar if sender else None
+                # Verify membership (cached)
+                if not await membership.is_member(user_id_str, room_id):
+                    print(f"⚠️  [WS:{user_id_str[:8]}] Can't send to {room_id[:8]} - not member")
+                    manager.send(ws, {
+                        "type": "error",
+                        "message": "Not a member of this conversation"
+                    })
+                    continue
+
+                # Sending ends the sender's typing indicator
+                typing_coalescer.stop_typing(room_id, user_id_str)
+
+                # ✅ Get all conversation members (cached)
+                member_ids = list(await membership.member_ids(room_id))
+
+                # Sender info was loaded at connect
+                sender = profiles.get(user_id_str)
 
                 # Generate message ID
                 msg_id = str(uuid.uuid4())
+                timestamp = datetime.now(timezone.utc).isoformat()
                 
                 # Add to Redis Streams for persistence
                 await streams.add_message({
@@ -189,7 +275,7 @@ async def ws_chat(ws: WebSocket):
                     "conversationId": room_id,
                     "senderId": user_id_str,
                     "text": text,
-                    "timestamp": datetime.now(timezone.utc).isoformat()
+                    "timestamp": timestamp
                 })
 
                 # ✅ Build payload with sender info
@@ -198,48 +284,32 @@ async def ws_chat(ws: WebSocket):
                     "roomId": room_id,
                     "messageId": msg_id,
                     "senderId": user_id_str,
-                    "senderName": sender_name,
-                    "senderAvatar": sender_avatar,
+                    "senderName": sender["name"],
+                    "senderAvatar": sender["avatar"],
                     "text": text,
-                    "timestamp": datetime.now(timezone.utc).isoformat(),
+                    "timestamp": timestamp,
                     "status": "sent"
                 }
 
-                # ✅ CRITICAL: Send to ALL MEMBERS (not just room)
+                # ✅ CRITICAL: Send to ALL MEMBERS (not just room), on every node
                 # This ensures users receive messages even when viewing different chats
-                sent_count = 0
-                for member_id in member_ids:
-                    if member_id in manager.user_sockets:
-                        for member_ws in manager.user_sockets[member_id]:
-                            try:
-                                await member_ws.send_json(payload)
-                                sent_count += 1
-                                print(f"💬 [WS] Sent message to member {member_id[:8]}")
-                            except Exception as e:
-                                print(f"❌ Failed to send to {member_id[:8]}: {e}")
-                    else:
-                        print(f"⚠️  [WS] Member {member_id[:8]} not connected")
-
-                print(f"✅ [WS] Message {msg_id[:8]} delivered to {sent_count}/{len(member_ids)} members")
+                sent_count = await deliver_to_users(member_ids, payload)
+
+                print(f"✅ [WS] Message {msg_id[:8]} delivered to {sent_count} local socket(s) of {len(member_ids)} members")
                 continue
 
             # ===== TYPING INDICATOR =====
             if event_type == "typing" and room_id:
                 is_typing = data.get("isTyping", False)
                 
-                async with async_session_maker() as db:
-                    is_member = await _check_membership(db, user_id, room_id)
-                    if not is_member:
-                        continue
+                if not await membership.is_member(user_id_str, room_id):
+                    continue
 
-                payload = {
-                    "type": "typing",
-                    "roomId": room_id,
-                    "userId": user_id_str,
-                    "isTyping": is_typing
-                }
-                await publish_room(room_id, payload)
-                print(f"⌨️  [WS:{user_id_str[:8]}] Typing: {is_typing} in {room_id[:8]}")
+                # Throttled and merged per room; see TypingCoalescer
+                if is_typing:
+                    typing_coalescer.start_typing(room_id, user_id_str)
+                else:
+                    typing_coalescer.stop_typing(room_id, user_id_str)
                 continue
 
             # ===== READ RECEIPT =====
@@ -247,26 +317,36 @@ async def ws_chat(ws: WebSocket):
                 last_msg_id = data.get("lastMessageId")
                 
                 # Skip temp messages
-                if last_msg_id and last_msg_id.startswith('temp-'):
+                if not last_msg_id or last_msg_id.startswith('temp-'):
                     print(f"⏭️  [WS:{user_id_str[:8]}] Skipping temp message read receipt")
                     continue
-                
-                async with async_session_maker() as db:
-                    await _mark_read(db, user_id, room_id, last_msg_id)
 
-                payload = {
-                    "type": "read",
-                    "roomId": room_id,
-                    "userId": user_id_str,
-                    "lastMessageId": last_msg_id
-                }
-                await publish_room(room_id, payload)
-                print(f"📖 [WS:{user_id_str[:8]}] Marked {last_msg_id[:8]} as read")
+                if not await membership.is_member(user_id_str, room_id):
+                    continue
+
+                # Written and broadcast by the next receipt flush
+                read_receipts.add(user_id_str, room_id, last_msg_id)
                 continue
 
             # ===== PING =====
             if event_type == "ping":
-                await ws.send_json({"type": "pong"})
+                presence.touch(user_id_str)
+                manager.send(ws, {"type": "pong"})
+                continue
+
+            # Reply to a server ping - receiving it already refreshed the socket
+            if event_type == "pong":
+                continue
+
+            # ===== PRESENCE SUBSCRIBE =====
+            if event_type == "presence_subscribe":
+                user_ids = [str(uid) for uid in data.get("userIds") or []]
+                online = await presence.subscribe(user_id_str, user_ids)
+                manager.send(ws, {
+                    "type": "presence",
+                    "online": sorted(online),
+                    "offline": sorted(set(user_ids) - online)
+                })
                 continue
 
             # Unknown event
@@ -280,83 +360,7 @@ async def ws_chat(ws: WebSocket):
         traceback.print_exc()
     finally:
         # Cleanup
-        manager.untrack(user_id_str, ws)
-        await pubsub.redis.srem(ONLINE_SET_KEY, user_id_str)
-
-        # ✅ Broadcast offline to ALL users
-        offline_payload = {"type": "offline", "userId": user_id_str}
-        
-        offline_count = 0
-        for uid, ws_set in manager.user_sockets.items():
-            for user_ws in ws_set:
-                try:
-                    await user_ws.send_json(offline_payload)
-                    offline_count += 1
-                except Exception as e:
-                    print(f"❌ Failed to send offline to {uid[:8]}: {e}")
-        
-        print(f"👋 [WS:{user_id_str[:8]}] Offline broadcast sent to {offline_count} users")
-
-
-# ========== Helper Functions ==========
-
-async def _check_membership(db: AsyncSession, user_id: uuid.UUID, conversation_id: str) -> bool:
-    """Check if user is a member of the conversation"""
-    try:
-        conv_uuid = uuid.UUID(conversation_id)
-        result = await db.execute(
-            select(ConversationMember).where(
-                ConversationMember.conversation_id == conv_uuid,
-                ConversationMember.user_id == user_id
-            )
-        )
-        return result.scalar_one_or_none() is not None
-    except Exception as e:
-        print(f"❌ Membership check error: {e}")
-        return False
-
-
-async def _mark_read(
-    db: AsyncSession, 
-    user_id: uuid.UUID, 
-    conversation_id: str, 
-    last_message_id: str | None
-) -> None:
-    """Mark message as read"""
-    if not last_message_id:
-        return
+        await _release_socket(user_id_str, ws)
 
-    # Skip temporary messages
-    if last_message_id.startswith('temp-'):
-        return
+        print(f"👋 [WS:{user_id_str[:8]}] Disconnected")
 
-    try:
-        msg_uuid = uuid.UUID(last_message_id)
-        
-        # Get or create receipt
-        result = await db.execute(
-            select(MessageReceipt).where(
-                MessageReceipt.message_id == msg_uuid,
-                MessageReceipt.user_id == user_id
-            )
-        )
-        receipt = result.scalar_one_or_none()
-        
-        if receipt:
-            receipt.status = "read"
-            receipt.read_at = datetime.now(timezone.utc)
-        else:
-            receipt = MessageReceipt(
-                message_id=msg_uuid,
-                user_id=user_id,
-                status="read",
-                read_at=datetime.now(timezone.utc)
-            )
-            db.add(receipt)
-        
-        await db.commit()
-        print(f"✅ Message {last_message_id[:8]} marked read by {user_id}")
-        
-    except Exception as e:
-        print(f"❌ Mark read error: {e}")
-        await db.rollback()
\ No newline at end of file
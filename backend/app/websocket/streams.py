@@ -1,30 +1,148 @@
 import json
+import time
+import zlib
 from redis.asyncio import Redis
 from app.config.settings import settings
 
-STREAM_KEY = "papyris:messages"
-CONSUMER_GROUP = "papyris-workers"
+STREAM_KEY = settings.STREAM_KEY
+CONSUMER_GROUP = settings.CONSUMER_GROUP
+DLQ_KEY = f"{STREAM_KEY}:dlq"
+
+
+def shard_key(shard: int) -> str:
+    # A single shard keeps the original un-suffixed key
+    if settings.STREAM_SHARDS == 1:
+        return STREAM_KEY
+    return f"{STREAM_KEY}:{shard}"
+
+
+def shard_keys() -> list[str]:
+    return [shard_key(i) for i in range(settings.STREAM_SHARDS)]
+
+
+def shard_for(conversation_id: str) -> str:
+    """All messages of a conversation go to the same shard, preserving their order"""
+    return shard_key(zlib.crc32(conversation_id.encode()) % settings.STREAM_SHARDS)
+
+
+def assigned_shard_keys() -> list[str]:
+    """Shards this worker consumes: WORKER_SHARDS ("0,3,5") or all of them"""
+    if not settings.WORKER_SHARDS:
+        return shard_keys()
+    return [shard_key(int(i)) for i in settings.WORKER_SHARDS.split(",") if i.strip()]
+
 
 class RedisStreams:
     def __init__(self):
         self.redis = Redis.from_url(settings.redis_dsn, decode_responses=True)
-    
-    async def init_stream(self):
-        try:
-            await self.redis.xgroup_create(STREAM_KEY, CONSUMER_GROUP, id='0', mkstream=True)
-        except Exception as e:
-            if "BUSYGROUP" not in str(e):
-                print(f"Stream init: {e}")
-    
+
+    async def init_stream(self, keys: list[str] | None = None):
+        for key in keys or shard_keys():
+            try:
+                await self.redis.xgroup_create(key, CONSUMER_GROUP, id='0', mkstream=True)
+            except Exception as e:
+                if "BUSYGROUP" not in str(e):
+                    print(f"Stream init: {e}")
+
+    def _trim_args(self) -> dict:
+        # Approximate (~) trimming lets Redis drop whole macro nodes instead of
+        # doing exact O(N) trimming on every XADD
+        if settings.STREAM_RETENTION_MS:
+            min_id = int(time.time() * 1000) - settings.STREAM_RETENTION_MS
+            return {"minid": f"{min_id}-0", "approximate": True}
+        return {"maxlen": settings.STREAM_MAX_LEN, "approximate": True}
+
     async def add_message(self, payload: dict) -> str:
         redis_payload = {"data": json.dumps(payload)}
-        return await self.redis.xadd(STREAM_KEY, redis_payload, maxlen=100000)
-    
-    async def read_messages(self, consumer_name: str, count: int = 10, block: int = 5000):
-        return await self.redis.xreadgroup(CONSUMER_GROUP, consumer_name, {STREAM_KEY: '>'}, count=count, block=block)
-    
-    async def ack_message(self, msg_id: str):
-        return await self.redis.xack(STREAM_KEY, CONSUMER_GROUP, msg_id)
-    
+        key = shard_for(payload.get("conversationId", ""))
+        return await self.redis.xadd(key, redis_payload, **self._trim_args())
+
+    async def read_messages(self, consumer_name: str, count: int = 10, block: int = 5000, keys: list[str] | None = None):
+        streams = {key: '>' for key in keys or shard_keys()}
+        return await self.redis.xreadgroup(CONSUMER_GROUP, consumer_name, streams, count=count, block=block)
+
+    async def ack_message(self, key: str, msg_id: str):
+        return await self.redis.xack(key, CONSUMER_GROUP, msg_id)
+
+    async def ack_messages(self, ids_by_key: dict[str, list[str]]):
+        """Ack entries from any number of shards with one XACK per shard in a single round trip"""
+        ids_by_key = {key: ids for key, ids in ids_by_key.items() if ids}
+        if not ids_by_key:
+            return
+        async with self.redis.pipeline(transaction=False) as p:
+            for key, ids in ids_by_key.items():
+                await p.xack(key, CONSUMER_GROUP, *ids)
+            await p.execute()
+
+    async def pending_count(self, keys: list[str] | None = None) -> int:
+        total = 0
+        for key in keys or shard_keys():
+            info = await self.redis.xpending(key, CONSUMER_GROUP)
+            total += info.get("pending", 0)
+        return total
+
+    async def claim_idle(self, key: str, consumer_name: str, min_idle_ms: int, start_id: str = "0-0", count: int = 100):
+        """
+        XAUTOCLAIM entries that have sat in the PEL longer than min_idle_ms.
+
+        Returns (next_start_id, entries, deleted_ids); next_start_id is "0-0"
+        once the whole PEL has been scanned.
+        """
+        result = await self.redis.xautoclaim(
+            key, CONSUMER_GROUP, consumer_name, min_idle_ms, start_id=start_id, count=count
+        )
+        next_id, claimed = result[0], result[1]
+        deleted = list(result[2]) if len(result) > 2 else []
+        # Redis 6.2 returns trimmed entries with no fields instead of listing them
+        entries = [(msg_id, fields) for msg_id, fields in claimed if fields is not None]
+        deleted += [msg_id for msg_id, fields in claimed if fields is None]
+        return next_id, entries, deleted
+
+    async def refresh_pending(self, key: str, consumer_name: str, msg_ids: list[str]):
+        """
+        Reset the idle time of entries this consumer still holds, so XAUTOCLAIM
+        leaves them alone; JUSTID keeps their delivery count unchanged
+        """
+        if msg_ids:
+            await self.redis.xclaim(key, CONSUMER_GROUP, consumer_name, 0, msg_ids, justid=True)
+
+    async def delivery_counts(self, key: str, consumer_name: str, min_id: str, max_id: str, count: int) -> dict:
+        pending = await self.redis.xpending_range(
+            key, CONSUMER_GROUP, min=min_id, max=max_id, count=count, consumername=consumer_name
+        )
+        return {p["message_id"]: p["times_delivered"] for p in pending}
+
+    async def dead_letter(self, key: str, msg_id: str, fields: dict, deliveries: int):
+        """Move an entry to the dead-letter stream and ack it atomically"""
+        async with self.redis.pipeline(transaction=True) as p:
+            await p.xadd(DLQ_KEY, {**fields, "sourceStream": key, "sourceId": msg_id, "deliveries": deliveries})
+            await p.xack(key, CONSUMER_GROUP, msg_id)
+            await p.execute()
+
+    async def read_dead_letters(self, count: int = 100, start: str = "-"):
+        return await self.redis.xrange(DLQ_KEY, min=start, count=count)
+
+    async def replay_dead_letter(self, dlq_id: str) -> str | None:
+        """Re-queue a dead letter on its shard and remove it from the DLQ"""
+        entries = await self.redis.xrange(DLQ_KEY, min=dlq_id, max=dlq_id)
+        if not entries:
+            return None
+        _, fields = entries[0]
+        data = fields.get("data", "{}")
+        key = shard_for(json.loads(data).get("conversationId", ""))
+        # The worker dates messages by their entry ID; keep the original one
+        replayed = {"data": data}
+        original_id = fields.get("originalId") or fields.get("sourceId")
+        if original_id:
+            replayed["originalId"] = original_id
+        async with self.redis.pipeline(transaction=True) as p:
+            await p.xadd(key, replayed, **self._trim_args())
+            await p.xdel(DLQ_KEY, dlq_id)
+            new_id, _ = await p.execute()
+        return new_id
+
+    async def purge_dead_letters(self) -> int:
+        return await self.redis.delete(DLQ_KEY)
+
     async def close(self):
-        await self.redis.close()
\ No newline at end of file
+        await self.redis.close()
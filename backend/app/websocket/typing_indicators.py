@@ -0,0 +1,152 @@
+# backend/app/websocket/typing_indicators.py
+
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from app.config.settings import settings
+from app.core import metrics
+from app.websocket.registry import NODE_ID
+
+Publish = Callable[[list[dict]], Awaitable[None]]
+Broadcast = Callable[[str, dict], int]
+
+
+class TypingCoalescer:
+    """
+    Server-side throttling and merging of typing indicators.
+
+    Clients send "typing" on every keystroke; those only update in-memory
+    state here. Every WS_TYPING_FLUSH_INTERVAL_MS a node publishes, per room
+    whose local typists changed, the set of users typing on that node - and
+    re-publishes it every WS_TYPING_THROTTLE seconds while someone keeps
+    typing. A typist who goes quiet for WS_TYPING_TIMEOUT seconds is
+    stopped by the server. Receiving nodes merge the sets from all nodes
+    and send each room at most one frame per interval listing everyone who
+    is typing.
+    """
+
+    def __init__(self) -> None:
+        self._local: dict[str, dict[str, float]] = {}  # room -> user -> expires (typists on this node)
+        self._dirty: set[str] = set()  # rooms whose local typists changed
+        self._published: dict[str, float] = {}  # room -> last publish time
+        self._remote: dict[str, dict[str, tuple[frozenset, float]]] = {}  # room -> node -> (users, expires)
+        self._changed: set[str] = set()  # rooms with new state from some node
+        self._sent: dict[str, frozenset] = {}  # room -> typists last sent to local sockets
+        self._publish: Publish | None = None
+        self._broadcast: Broadcast | None = None
+        self._task: asyncio.Task | None = None
+
+    def start_typing(self, room_id: str, user_id: str) -> None:
+        metrics.inc("typing_events_received")
+        typists = self._local.setdefault(room_id, {})
+        if user_id not in typists:
+            self._dirty.add(room_id)
+        typists[user_id] = time.monotonic() + settings.WS_TYPING_TIMEOUT
+
+    def stop_typing(self, room_id: str, user_id: str) -> None:
+        metrics.inc("typing_events_received")
+        typists = self._local.get(room_id)
+        if typists and typists.pop(user_id, None) is not None:
+            self._dirty.add(room_id)
+
+    def forget_user(self, user_id: str) -> None:
+        """The user's last local socket is gone"""
+        for room_id, typists in self._local.items():
+            if typists.pop(user_id, None) is not None:
+                self._dirty.add(room_id)
+
+    def merge(self, room_id: str, node_id: str, user_ids: list[str]) -> None:
+        """Typists reported by a node (including this one) for a room"""
+        nodes = self._remote.setdefault(room_id, {})
+        if user_ids:
+            nodes[node_id] = (frozenset(user_ids), time.monotonic() + settings.WS_TYPING_TIMEOUT)
+        else:
+            nodes.pop(node_id, None)
+        self._changed.add(room_id)
+
+    def _collect_publishes(self, now: float) -> list[dict]:
+        # Server-side stop for typists who went quiet
+        for room_id, typists in self._local.items():
+            expired = [user_id for user_id, expires in typists.items() if expires <= now]
+            for user_id in expired:
+                del typists[user_id]
+            if expired:
+                self._dirty.add(room_id)
+            elif typists and now - self._published.get(room_id, 0) >= settings.WS_TYPING_THROTTLE:
+                # Still typing - refresh so other nodes don't time it out
+                self._dirty.add(room_id)
+
+        events = []
+        for room_id in self._dirty:
+            typists = self._local.get(room_id, {})
+            events.append({"roomId": room_id, "typing": {"node": NODE_ID, "userIds": sorted(typists)}})
+            self._published[room_id] = now
+            if not typists:
+                self._local.pop(room_id, None)
+                self._published.pop(room_id, None)
+        self._dirty.clear()
+        return events
+
+    def _collect_frames(self, now: float) -> list[dict]:
+        for room_id, nodes in self._remote.items():
+            expired = [node_id for node_id, (_, expires) in nodes.items() if expires <= now]
+            for node_id in expired:
+                del nodes[node_id]
+            if expired:
+                self._changed.add(room_id)
+
+        frames = []
+        for room_id in self._changed:
+            nodes = self._remote.get(room_id, {})
+            typists = frozenset().union(*(users for users, _ in nodes.values()))
+            previous = self._sent.get(room_id, frozenset())
+            if typists == previous:
+                continue
+            # userId/isTyping keep single-typist clients working
+            changed = sorted(typists - previous) or sorted(previous - typists)
+            frames.append({
+                "type": "typing",
+                "roomId": room_id,
+                "userIds": sorted(typists),
+                "userId": changed[0],
+                "isTyping": changed[0] in typists,
+            })
+            if typists:
+                self._sent[room_id] = typists
+            else:
+                self._sent.pop(room_id, None)
+                self._remote.pop(room_id, None)
+        self._changed.clear()
+        return frames
+
+    async def flush(self) -> None:
+        now = time.monotonic()
+        events = self._collect_publishes(now)
+        if events:
+            metrics.inc("typing_events_published", len(events))
+            await self._publish(events)
+
+        for frame in self._collect_frames(now):
+            metrics.inc("typing_frames_sent", self._broadcast(frame["roomId"], frame))
+
+    async def run(self) -> None:
+        interval = settings.WS_TYPING_FLUSH_INTERVAL_MS / 1000
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"❌ Typing flush error: {e}")
+
+    def start(self, publish: Publish, broadcast: Broadcast) -> None:
+        self._publish = publish
+        self._broadcast = broadcast
+        self._task = asyncio.create_task(self.run())
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+
+
+typing_coalescer = TypingCoalescer()
@@ -178,29 +178,149 @@
 
 import asyncio
 import json
+import os
+import socket
+import time
 import uuid
-from datetime import datetime
-from sqlalchemy.ext.asyncio import AsyncSession
+import zlib
+from collections import defaultdict, deque
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, func, or_, bindparam, tuple_
+from sqlalchemy.dialects.postgresql import insert
 
+from app.config.settings import settings
+from app.core import metrics
 from app.db.session import async_session_maker
-from app.websocket.streams import RedisStreams
+from app.websocket.streams import RedisStreams, assigned_shard_keys
 from app.models.message import Message
-from app.models.message_receipt import MessageReceipt
+from app.models.conversation import Conversation
 from app.models.conversation_member import ConversationMember
-from sqlalchemy import select
+
+# Rows per multi-row INSERT (asyncpg allows at most 32767 bind params per statement)
+INSERT_CHUNK_SIZE = 1000
+
+
+def _chunks(rows: list, size: int = INSERT_CHUNK_SIZE):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def _parse_entry(entry_id: str, fields: dict) -> dict | None:
+    """Turn a stream entry into a messages row, or None if it is unusable"""
+    try:
+        data = json.loads(fields.get('data', '{}'))
+        message_id = data.get('messageId')
+        conversation_id = data.get('conversationId')
+        sender_id = data.get('senderId')
+        text = data.get('text')
+
+        if not all([message_id, conversation_id, sender_id, text]):
+            return None
+
+        return {
+            "id": uuid.UUID(message_id),
+            "conversation_id": uuid.UUID(conversation_id),
+            "sender_id": uuid.UUID(sender_id),
+            "text": text,
+            # Redis' clock, not the gateway's: a conversation lives on one shard,
+            # so this follows stream order whatever the skew between nodes
+            "created_at": _entry_time(_original_entry_id(entry_id, fields)),
+        }
+    except (ValueError, TypeError):
+        return None
+
+
+def _conversation_key(fields: dict) -> str:
+    try:
+        return json.loads(fields.get('data', '{}')).get('conversationId') or ''
+    except (ValueError, AttributeError):
+        return ''
+
+
+def _entry_time_ms(entry_id: str) -> int:
+    """Stream IDs are '<ms>-<seq>'; the first part is the XADD time"""
+    return int(entry_id.split('-', 1)[0])
+
+
+def _original_entry_id(entry_id: str, fields: dict) -> str:
+    """Replayed dead letters carry the ID they were first added with"""
+    ms, _, seq = (fields.get('originalId') or '').partition('-')
+    if ms.isdigit() and (seq.isdigit() or not seq):
+        return fields['originalId']
+    return entry_id
+
+
+def _entry_time(entry_id: str) -> datetime:
+    """XADD time of an entry as an aware UTC datetime; the sequence number orders entries within a millisecond"""
+    ms, _, seq = entry_id.partition('-')
+    return datetime.fromtimestamp(int(ms) / 1000, timezone.utc) + timedelta(microseconds=min(int(seq or 0), 999))
+
+
+class Lane:
+    """
+    One ordered processing lane.
+
+    Entries are hash-partitioned by conversationId, so a conversation always
+    lands on the same lane and is persisted in stream order, while different
+    lanes write to Postgres concurrently.
+    """
+
+    def __init__(self, index: int, worker: "MessageWorker"):
+        self.index = index
+        self.worker = worker
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.WORKER_LANE_QUEUE_SIZE)
+        self.inflight: deque[str] = deque()  # first entry ID of each queued batch
+        self.pending = 0
+        self.processed = 0
+        self.task: asyncio.Task | None = None
+
+    async def submit(self, entries: list[tuple[str, str, dict]]):
+        """Queue a batch; waits when the lane is saturated (backpressure)"""
+        self.inflight.append(entries[0][1])
+        self.pending += len(entries)
+        await self.queue.put(entries)
+
+    def lag_ms(self) -> int:
+        """Age of the oldest entry this lane has not persisted yet"""
+        if not self.inflight:
+            return 0
+        return max(0, int(time.time() * 1000) - _entry_time_ms(self.inflight[0]))
+
+    async def run(self):
+        while True:
+            entries = await self.queue.get()
+            try:
+                await self.worker.process_entries(entries)
+            finally:
+                self.worker.untrack(entries)
+                self.inflight.popleft()
+                self.pending -= len(entries)
+                self.processed += len(entries)
+                self.queue.task_done()
 
 
 class MessageWorker:
-    def __init__(self):
+    def __init__(self, lanes: int | None = None):
         self.streams = RedisStreams()
-        self.consumer_name = f"worker-{uuid.uuid4().hex[:8]}"
+        # Unique per process: the PEL and delivery counts are kept per consumer
+        self.consumer_name = settings.WORKER_CONSUMER_NAME or f"worker-{socket.gethostname()}-{os.getpid()}"
         self.running = False
+        self.shard_keys = assigned_shard_keys()
+        self.lanes = [Lane(i, self) for i in range(lanes or settings.WORKER_LANES)]
+        self.queued: dict[str, set[str]] = defaultdict(set)  # stream key -> entry IDs handed to a lane, not yet done
+        self._metrics_task: asyncio.Task | None = None
+        self._reclaim_task: asyncio.Task | None = None
 
     async def start(self):
         """Start the worker"""
-        print(f"🚀 Starting message worker: {self.consumer_name}")
-        await self.streams.init_stream()
+        print(f"🚀 Starting message worker: {self.consumer_name} ({len(self.lanes)} lanes, shards {self.shard_keys})")
+        await self.streams.init_stream(self.shard_keys)
         self.running = True
+
+        for lane in self.lanes:
+            lane.task = asyncio.create_task(lane.run())
+        self._metrics_task = asyncio.create_task(self.report_metrics())
+        self._reclaim_task = asyncio.create_task(self.reclaim_loop())
         
         try:
             await self.consume_loop()
@@ -213,109 +333,306 @@ class MessageWorker:
         """Stop the worker"""
         print("🛑 Stopping message worker...")
         self.running = False
+        # Unfinished entries stay unacked in the stream and are redelivered
+        for task in [lane.task for lane in self.lanes] + [self._metrics_task, self._reclaim_task]:
+            if task:
+                task.cancel()
         await self.streams.close()
 
     async def consume_loop(self):
         """Main consumption loop"""
-        print("👂 Listening for messages...")
+        print(f"👂 Listening for messages (batch size {settings.WORKER_BATCH_SIZE})...")
         
         while self.running:
             try:
                 results = await self.streams.read_messages(
                     consumer_name=self.consumer_name,
-                    count=10,
-                    block=5000
+                    count=settings.WORKER_BATCH_SIZE,
+                    block=settings.WORKER_BLOCK_MS,
+                    keys=self.shard_keys
                 )
                 
                 if not results:
                     continue
                 
-                for stream_name, messages in results:
-                    for msg_id, fields in messages:
-                        try:
-                            # ✅ FIX: msg_id is already a string, no .decode() needed
-                            await self.process_message(msg_id, fields)
-                        except Exception as e:
-                            print(f"❌ Error processing message {msg_id}: {e}")
-                            import traceback
-                            traceback.print_exc()
+                await self.dispatch([
+                    (key, msg_id, fields) for key, messages in results for msg_id, fields in messages
+                ])
                         
             except Exception as e:
                 print(f"❌ Error in consume loop: {e}")
                 await asyncio.sleep(1)
 
-    async def process_message(self, msg_id: str, fields: dict):
+    def lane_for(self, fields: dict) -> Lane:
+        return self.lanes[zlib.crc32(_conversation_key(fields).encode()) % len(self.lanes)]
+
+    async def dispatch(self, entries: list[tuple[str, str, dict]]):
+        """Split (stream key, entry ID, fields) triples by conversation and hand each lane its share, in order"""
+        buckets: dict[int, list] = defaultdict(list)
+        for entry in entries:
+            self.queued[entry[0]].add(entry[1])
+            buckets[self.lane_for(entry[2]).index].append(entry)
+        for index, lane_entries in buckets.items():
+            await self.lanes[index].submit(lane_entries)
+
+    def untrack(self, entries: list[tuple[str, str, dict]]):
+        for key, msg_id, _ in entries:
+            self.queued[key].discard(msg_id)
+
+    async def process_entries(self, entries: list[tuple[str, str, dict]]):
+        """Persist entries as one batch, falling back to one by one on failure"""
+        try:
+            await self.process_batch(entries)
+        except Exception as e:
+            print(f"❌ Batch of {len(entries)} failed, retrying one by one: {e}")
+            # Isolate the bad entry so it doesn't hold back the rest
+            for key, msg_id, fields in entries:
+                try:
+                    await self.process_batch([(key, msg_id, fields)])
+                except Exception as e:
+                    print(f"❌ Error processing message {msg_id}: {e}")
+                    import traceback
+                    traceback.print_exc()
+
+    async def reclaim_loop(self):
+        """Periodically take over entries stranded in the PEL"""
+        while True:
+            await asyncio.sleep(settings.WORKER_RECLAIM_INTERVAL)
+            try:
+                await self.reclaim()
+            except Exception as e:
+                print(f"❌ Error reclaiming pending entries: {e}")
+
+    async def reclaim(self):
+        """
+        XAUTOCLAIM entries idle longer than WORKER_RECLAIM_IDLE_MS (left by a
+        crashed consumer or by failed processing) and feed them back through
+        the lanes. Entries delivered more than WORKER_MAX_DELIVERIES times are
+        moved to the dead-letter stream instead of being retried forever.
+        """
+        for key in self.shard_keys:
+            await self.reclaim_shard(key)
+
+    async def reclaim_shard(self, key: str):
+        # Entries still waiting in a lane are slow, not stranded: keep them off the claim
+        queued = self.queued[key]
+        await self.streams.refresh_pending(key, self.consumer_name, list(queued))
+
+        start_id = "0-0"
+        while True:
+            start_id, entries, deleted = await self.streams.claim_idle(
+                key,
+                self.consumer_name,
+                settings.WORKER_RECLAIM_IDLE_MS,
+                start_id=start_id,
+                count=settings.WORKER_BATCH_SIZE
+            )
+
+            if deleted:
+                # Trimmed out of the stream before anyone persisted them
+                print(f"⚠️ {len(deleted)} pending entries were trimmed before being persisted: {deleted[:5]}")
+                metrics.inc("worker_entries_lost", len(deleted))
+
+            if entries:
+                counts = await self.streams.delivery_counts(
+                    key, self.consumer_name, entries[0][0], entries[-1][0], len(entries)
+                )
+                retry = []
+                for msg_id, fields in entries:
+                    if msg_id in queued:
+                        continue  # queued locally after the refresh
+                    deliveries = counts.get(msg_id, 0)
+                    if deliveries > settings.WORKER_MAX_DELIVERIES:
+                        await self.streams.dead_letter(key, msg_id, fields, deliveries)
+                        metrics.inc("worker_dead_lettered")
+                        print(f"☠️ Entry {msg_id} moved to dead-letter stream after {deliveries} deliveries")
+                    else:
+                        retry.append((key, msg_id, fields))
+
+                if retry:
+                    metrics.inc("worker_reclaimed", len(retry))
+                    print(f"♻️ Reclaimed {len(retry)} pending entries")
+                    await self.dispatch(retry)
+
+            if start_id == "0-0":
+                break
+
+    async def report_metrics(self):
+        """Publish per-lane lag/backlog gauges and log them periodically"""
+        while True:
+            await asyncio.sleep(settings.WORKER_METRICS_INTERVAL)
+            for lane in self.lanes:
+                metrics.set_gauge("worker_lane_lag_ms", lane.lag_ms(), lane=lane.index)
+                metrics.set_gauge("worker_lane_pending", lane.pending, lane=lane.index)
+                metrics.set_gauge("worker_lane_processed", lane.processed, lane=lane.index)
+            summary = ", ".join(
+                f"#{lane.index}: lag={lane.lag_ms()}ms pending={lane.pending}" for lane in self.lanes
+            )
+            try:
+                pel_size = await self.streams.pending_count(self.shard_keys)
+                metrics.set_gauge("worker_pel_size", pel_size)
+                summary += f" | PEL={pel_size}"
+            except Exception as e:
+                print(f"❌ Failed to read PEL size: {e}")
+            print(f"📈 Lanes {summary}")
+
+    async def process_message(self, key: str, msg_id: str, fields: dict):
         """Process a single message from the stream"""
-        # ✅ FIX: fields is already decoded, no .decode() needed
-        data_json = fields.get('data', '{}')
-        data = json.loads(data_json)
-        
-        message_id = data.get('messageId')
-        conversation_id = data.get('conversationId')
-        sender_id_str = data.get('senderId')
-        text = data.get('text')
-        
-        if not all([message_id, conversation_id, sender_id_str, text]):
-            print(f"⚠️ Invalid message data: {data}")
-            await self.streams.ack_message(msg_id)
+        await self.process_batch([(key, msg_id, fields)])
+
+    async def process_batch(self, entries: list[tuple[str, str, dict]]):
+        """
+        Persist a batch of stream entries in one transaction.
+
+        Redelivered messages are skipped by INSERT ... ON CONFLICT DO NOTHING,
+        watermarks and counters are written with multi-row statements, and the
+        whole batch is acknowledged with one XACK per shard after commit. On failure
+        nothing is acked so the entries can be retried.
+        """
+        if not entries:
             return
-        
-        print(f"📨 Processing message {message_id} from {sender_id_str}")
-        
-        async with async_session_maker() as db:
-            try:
-                # ✅ Convert to UUIDs
-                sender_id = uuid.UUID(sender_id_str)
-                message_uuid = uuid.UUID(message_id)
-                conversation_uuid = uuid.UUID(conversation_id)
-                
-                # Check if message already exists
-                result = await db.execute(
-                    select(Message).where(Message.id == message_uuid)
+
+        rows = {}
+        for _, msg_id, fields in entries:
+            row = _parse_entry(msg_id, fields)
+            if row is None:
+                print(f"⚠️ Invalid message data in {msg_id}: {fields}")
+                continue
+            rows.setdefault(row["id"], row)
+
+        if rows:
+            async with async_session_maker() as db:
+                try:
+                    inserted = await self._persist(db, list(rows.values()))
+                    await db.commit()
+                except Exception as e:
+                    await db.rollback()
+                    print(f"❌ Failed to persist batch of {len(rows)} messages: {e}")
+                    raise
+
+            skipped = len(rows) - len(inserted)
+            print(f"✅ Persisted {len(inserted)} messages ({skipped} already stored)")
+
+        ids_by_key = defaultdict(list)
+        for key, msg_id, _ in entries:
+            ids_by_key[key].append(msg_id)
+        await self.streams.ack_messages(ids_by_key)
+
+    async def _persist(self, db, rows: list[dict]) -> list[dict]:
+        """Write messages, delivery watermarks and inbox counters; returns the newly inserted rows"""
+        # Insert messages, skipping ones that already exist (idempotency)
+        inserted_ids = set()
+        for chunk in _chunks(rows):
+            result = await db.execute(
+                insert(Message)
+                .values(chunk)
+                .on_conflict_do_nothing(index_elements=[Message.id])
+                .returning(Message.id)
+            )
+            inserted_ids.update(result.scalars().all())
+
+        new_rows = [row for row in rows if row["id"] in inserted_ids]
+        if not new_rows:
+            return new_rows
+
+        # Members of every affected conversation in one query
+        conversation_ids = {row["conversation_id"] for row in new_rows}
+        members_result = await db.execute(
+            select(ConversationMember.conversation_id, ConversationMember.user_id).where(
+                ConversationMember.conversation_id.in_(conversation_ids)
+            )
+        )
+        members = defaultdict(list)
+        for conversation_id, user_id in members_result:
+            members[conversation_id].append(user_id)
+
+        # Unread increments and newest message per conversation
+        unread = defaultdict(int)
+        latest = {}
+        for row in new_rows:
+            conversation_id = row["conversation_id"]
+            for user_id in members[conversation_id]:
+                if user_id != row["sender_id"]:
+                    unread[(conversation_id, user_id)] += 1
+
+            current = latest.get(conversation_id)
+            if current is None or (row["created_at"], row["id"]) > (current["created_at"], current["id"]):
+                latest[conversation_id] = row
+
+        # ✅ Keep inbox denormalization in the same transaction
+        conversations = Conversation.__table__
+        conversation_members = ConversationMember.__table__
+        await db.execute(
+            conversations.update()
+            .where(
+                conversations.c.id == bindparam("b_conversation_id"),
+                or_(
+                    conversations.c.last_message_at.is_(None),
+                    conversations.c.last_message_at <= bindparam("b_created_at")
                 )
-                if result.scalar_one_or_none():
-                    print(f"ℹ️ Message {message_id} already exists, skipping")
-                    await self.streams.ack_message(msg_id)
-                    return
-                
-                # Create message
-                message = Message(
-                    id=message_uuid,
-                    conversation_id=conversation_uuid,
-                    sender_id=sender_id,
-                    text=text
+            )
+            .values(
+                last_message_id=bindparam("b_message_id"),
+                last_message_preview=bindparam("b_preview"),
+                last_message_at=bindparam("b_created_at"),
+                updated_at=func.now()
+            ),
+            [
+                {
+                    "b_conversation_id": conversation_id,
+                    "b_message_id": row["id"],
+                    "b_preview": row["text"][:255],
+                    "b_created_at": row["created_at"],
+                }
+                for conversation_id, row in latest.items()
+            ]
+        )
+
+        # Delivery watermark: one row per member instead of one receipt per
+        # (message, recipient); only ever moves forward
+        delivered = tuple_(
+            conversation_members.c.last_delivered_message_at,
+            conversation_members.c.last_delivered_message_id
+        )
+        await db.execute(
+            conversation_members.update()
+            .where(
+                conversation_members.c.conversation_id == bindparam("b_conversation_id"),
+                or_(
+                    conversation_members.c.last_delivered_message_at.is_(None),
+                    conversation_members.c.last_delivered_message_id.is_(None),
+                    delivered < tuple_(bindparam("b_created_at"), bindparam("b_message_id"))
                 )
-                db.add(message)
-                await db.flush()
-                
-                # Create delivery receipts
-                members_result = await db.execute(
-                    select(ConversationMember).where(
-                        ConversationMember.conversation_id == conversation_uuid,
-                        ConversationMember.user_id != sender_id
-                    )
+            )
+            .values(
+                last_delivered_message_id=bindparam("b_message_id"),
+                last_delivered_message_at=bindparam("b_created_at")
+            ),
+            [
+                {
+                    "b_conversation_id": conversation_id,
+                    "b_message_id": row["id"],
+                    "b_created_at": row["created_at"],
+                }
+                for conversation_id, row in latest.items()
+            ]
+        )
+
+        if unread:
+            await db.execute(
+                conversation_members.update()
+                .where(
+                    conversation_members.c.conversation_id == bindparam("b_conversation_id"),
+                    conversation_members.c.user_id == bindparam("b_user_id")
                 )
-                members = members_result.scalars().all()
-                
-                for member in members:
-                    receipt = MessageReceipt(
-                        message_id=message_uuid,
-                        user_id=member.user_id,
-                        status="delivered"
-                    )
-                    db.add(receipt)
-                
-                await db.commit()
-                
-                print(f"✅ Message {message_id} persisted with {len(members)} receipts")
-                await self.streams.ack_message(msg_id)
-                
-            except Exception as e:
-                await db.rollback()
-                print(f"❌ Failed to persist message {message_id}: {e}")
-                import traceback
-                traceback.print_exc()
-                raise
+                .values(unread_count=conversation_members.c.unread_count + bindparam("b_count")),
+                [
+                    {"b_conversation_id": conversation_id, "b_user_id": user_id, "b_count": count}
+                    for (conversation_id, user_id), count in unread.items()
+                ]
+            )
+
+        return new_rows
 
 
 async def main():
@@ -325,4 +642,4 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,166 @@
+"""
+Microbenchmark: fan-out of one event to many WebSocket connections
+
+Compares encoding the payload for every recipient against WSManager
+encoding the frame once and queueing the same text to every socket's
+writer, plus the original sequential send_json loop for reference.
+Sockets are in-memory fakes, so the numbers are the server-side CPU cost
+of fan-out only.
+
+Each strategy reports the fan-out phase (what the broadcasting handler
+waits for: encoding and queueing) separately from the drain (the writer
+tasks handing frames to the sockets, identical work in both queued
+variants), plus how many JSON encodes it did and how long they took.
+
+Run with:
+    python scripts/bench_fanout.py --sockets 10000 --events 20
+"""
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+
+import app.websocket.manager as manager_module
+from app.config.settings import settings
+from app.core.serialization import JSON_BACKEND
+from app.websocket.manager import WSManager
+
+
+delivered = 0
+
+
+class EncodeStats:
+    """Counts and times every JSON encode made while fanning out"""
+
+    def __init__(self, encode):
+        self.encode = encode
+        self.calls = 0
+        self.seconds = 0.0
+
+    def __call__(self, obj) -> str:
+        start = time.perf_counter()
+        text = self.encode(obj)
+        self.seconds += time.perf_counter() - start
+        self.calls += 1
+        return text
+
+
+def starlette_dumps(data) -> str:
+    # Same encoding Starlette's WebSocket.send_json does
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+class FakeWebSocket:
+    encode = starlette_dumps
+
+    async def send_json(self, data):
+        await self.send_text(FakeWebSocket.encode(data))
+
+    async def send_text(self, text):
+        global delivered
+        delivered += 1
+
+
+def make_payload(i: int) -> dict:
+    return {
+        "type": "message",
+        "roomId": "6f1c2b0e-3d7a-4c55-9a51-0c8f5b0d2a11",
+        "messageId": f"00000000-0000-0000-0000-{i:012d}",
+        "senderId": "1b7e4c0a-9f3d-4e2b-8a6c-5d4f3e2a1b0c",
+        "senderName": "loadtest",
+        "senderAvatar": None,
+        "text": "The quick brown fox jumps over the lazy dog " * 3,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "status": "sent",
+    }
+
+
+async def bench_per_socket(sockets: list, events: int) -> tuple[float, float, EncodeStats]:
+    """Sequential send_json: encoding and sending are one phase, nothing to drain"""
+    stats = FakeWebSocket.encode = EncodeStats(starlette_dumps)
+    start = time.perf_counter()
+    for i in range(events):
+        payload = make_payload(i)
+        for ws in sockets:
+            await ws.send_json(payload)
+    FakeWebSocket.encode = starlette_dumps
+    return time.perf_counter() - start, 0.0, stats
+
+
+async def bench_queued(sockets: list, events: int, encode_once: bool) -> tuple[float, float, EncodeStats]:
+    """Returns (fan-out seconds, drain seconds, encode stats)"""
+    manager = WSManager()
+    user_ids = [f"user-{i}" for i in range(len(sockets))]
+    for user_id, ws in zip(user_ids, sockets):
+        manager.track_user(user_id, ws)
+
+    original_dumps = manager_module.dumps
+    stats = manager_module.dumps = EncodeStats(original_dumps)
+    fan_out = drain = 0.0
+    try:
+        for i in range(events):
+            payload = make_payload(i)
+            target = delivered + len(sockets)
+
+            start = time.perf_counter()
+            if encode_once:
+                manager.send_users(user_ids, payload)
+            else:
+                for ws in sockets:
+                    manager.send(ws, payload)
+            queued = time.perf_counter()
+
+            # Let the writer tasks drain their queues
+            while delivered < target:
+                await asyncio.sleep(0)
+            fan_out += queued - start
+            drain += time.perf_counter() - queued
+    finally:
+        manager_module.dumps = original_dumps
+
+    for user_id, ws in zip(user_ids, sockets):
+        await manager.untrack(user_id, ws)
+    return fan_out, drain, stats
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="WebSocket fan-out microbenchmark")
+    parser.add_argument("--sockets", type=int, default=10000)
+    parser.add_argument("--events", type=int, default=20)
+    args = parser.parse_args()
+
+    settings.WS_SEND_QUEUE_SIZE = max(settings.WS_SEND_QUEUE_SIZE, args.events)
+    print(f"🚀 Fan-out of {args.events} events to {args.sockets:,} sockets (backend: {JSON_BACKEND})\n")
+
+    results = {
+        "sequential send_json   ": await bench_per_socket(
+            [FakeWebSocket() for _ in range(args.sockets)], args.events
+        ),
+        "encode per socket+queue": await bench_queued(
+            [FakeWebSocket() for _ in range(args.sockets)], args.events, False
+        ),
+        "encode once + queue    ": await bench_queued(
+            [FakeWebSocket() for _ in range(args.sockets)], args.events, True
+        ),
+    }
+
+    for label, (fan_out, drain, stats) in results.items():
+        print(
+            f"📊 {label}: fan-out {fan_out * 1000:8.1f} ms ({fan_out / args.events * 1000:.2f} ms/event)"
+            f" | drain {drain * 1000:8.1f} ms"
+            f" | {stats.calls:,} encodes, {stats.seconds * 1000:.1f} ms"
+        )
+
+    per_socket, _, per_socket_stats = results["encode per socket+queue"]
+    once, _, once_stats = results["encode once + queue    "]
+    print(f"\n   {args.sockets * args.events:,} deliveries each; encode once makes the fan-out phase "
+          f"{per_socket / once:.1f}x faster and does {per_socket_stats.calls // max(once_stats.calls, 1):,}x "
+          f"fewer encodes ({per_socket_stats.seconds * 1000:.1f} -> {once_stats.seconds * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+"""
+Benchmark GET /conversations query cost
+
+Seeds a throwaway user with a growing number of conversations and shows that
+ChatService.get_inbox issues the same number of SQL statements regardless of
+inbox size. Seeded rows are removed at the end.
+
+Run with: python scripts/bench_inbox.py
+"""
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import event, delete
+
+import app.models  # noqa: register all models
+from app.db.session import engine, async_session_maker
+from app.models.user import User
+from app.models.conversation import Conversation
+from app.models.conversation_member import ConversationMember
+from app.models.message import Message
+from app.services.chat_service import ChatService
+
+SIZES = [10, 100, 500]
+MESSAGES_PER_CONVERSATION = 5
+
+query_count = 0
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    global query_count
+    query_count += 1
+
+
+async def seed(db, me: User, peer: User, n: int) -> list[uuid.UUID]:
+    conv_ids = []
+    for i in range(n):
+        conv = Conversation(kind="dm" if i % 2 else "group", title=f"bench-{i}")
+        db.add(conv)
+        await db.flush()
+        conv_ids.append(conv.id)
+        db.add_all([
+            ConversationMember(conversation_id=conv.id, user_id=me.id),
+            ConversationMember(conversation_id=conv.id, user_id=peer.id),
+        ])
+        for j in range(MESSAGES_PER_CONVERSATION):
+            db.add(Message(
+                conversation_id=conv.id,
+                sender_id=peer.id if j % 2 else me.id,
+                text=f"bench message {j}",
+            ))
+    await db.commit()
+    return conv_ids
+
+
+async def main():
+    global query_count
+    event.listen(engine.sync_engine, "before_cursor_execute", _count_query)
+
+    tag = uuid.uuid4().hex[:8]
+    async with async_session_maker() as db:
+        me = User(username=f"bench_me_{tag}", email=f"me_{tag}@bench.local", hashed_password="x")
+        peer = User(username=f"bench_peer_{tag}", email=f"peer_{tag}@bench.local", hashed_password="x")
+        db.add_all([me, peer])
+        await db.commit()
+
+        conv_ids: list[uuid.UUID] = []
+        print(f"{'conversations':>14} | {'queries':>7} | {'ms':>8}")
+        print("-" * 36)
+        try:
+            for size in SIZES:
+                conv_ids += await seed(db, me, peer, size - len(conv_ids))
+
+                query_count = 0
+                start = time.perf_counter()
+                rows = await ChatService.get_inbox(db, me.id)
+                elapsed = (time.perf_counter() - start) * 1000
+
+                assert len(rows) == size
+                print(f"{size:>14} | {query_count:>7} | {elapsed:>8.2f}")
+        finally:
+            await db.execute(delete(Conversation).where(Conversation.id.in_(conv_ids)))
+            await db.execute(delete(User).where(User.id.in_([me.id, peer.id])))
+            await db.commit()
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
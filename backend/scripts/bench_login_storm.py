@@ -0,0 +1,151 @@
+"""
+Benchmark WebSocket ping latency during a login storm
+
+Seeds a throwaway user, keeps one WebSocket open to a running API node and
+measures ping -> pong round trips, first idle and then while many clients
+hammer POST /auth/login on the same node. Every login runs bcrypt, so if
+hashing blocks the event loop the WebSocket round trips climb to hundreds
+of milliseconds; with hashing on the bcrypt pool they should barely move.
+
+Run against a single uvicorn worker so the logins and the socket share
+one event loop. Needs the API, Postgres and Redis running. The seeded user
+is removed at the end.
+
+The login rate limit must be off on the API node under test, or every login
+after the first few is rejected with 429 before bcrypt runs and the numbers
+say nothing about the event loop. The run aborts if most logins come back 429.
+
+Run with:
+    RATE_LIMIT_ENABLED=false uvicorn app.main:app --workers 1
+    python scripts/bench_login_storm.py --api http://localhost:8000 --concurrency 32 --seconds 10
+"""
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import websockets
+from sqlalchemy import delete
+
+import app.models  # noqa: register all models
+from app.core.security import create_access_token, hash_password
+from app.db.session import engine, async_session_maker
+from app.models.user import User
+
+PASSWORD = "bench-password"
+
+
+def percentile(values: list[float], pct: float) -> float:
+    index = min(len(values) - 1, int(len(values) * pct / 100))
+    return values[index]
+
+
+def report(label: str, latencies: list[float]) -> None:
+    latencies = sorted(latencies)
+    print(f"\n📊 {label}: {len(latencies):,} pings")
+    print(f"   p50 = {percentile(latencies, 50):.2f} ms")
+    print(f"   p99 = {percentile(latencies, 99):.2f} ms")
+    print(f"   max = {latencies[-1]:.2f} ms")
+
+
+async def ping_for(ws, seconds: float, interval: float) -> list[float]:
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        await ws.send(json.dumps({"type": "ping"}))
+        while json.loads(await ws.recv()).get("type") != "pong":
+            pass
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def login_storm(api: str, username: str, concurrency: int, stop: asyncio.Event) -> tuple[int, int, int]:
+    loop = asyncio.get_running_loop()
+    session = requests.Session()
+    ok = limited = failed = 0
+
+    def login() -> int:
+        return session.post(
+            f"{api}/api/v1/auth/login",
+            json={"identifier": username, "password": PASSWORD},
+            timeout=30
+        ).status_code
+
+    async def client():
+        nonlocal ok, limited, failed
+        while not stop.is_set():
+            status = await loop.run_in_executor(pool, login)
+            if status == 200:
+                ok += 1
+            elif status == 429:
+                limited += 1
+            else:
+                failed += 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+    return ok, limited, failed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="WebSocket ping latency during a login storm")
+    parser.add_argument("--api", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent login clients")
+    parser.add_argument("--seconds", type=float, default=10, help="duration of each phase")
+    parser.add_argument("--interval-ms", type=float, default=20, help="pause between pings")
+    args = parser.parse_args()
+
+    ws_url = args.api.replace("http", "ws", 1) + "/api/v1/ws/chat"
+    interval = args.interval_ms / 1000
+
+    tag = uuid.uuid4().hex[:8]
+    async with async_session_maker() as db:
+        user = User(
+            username=f"bench_login_{tag}",
+            email=f"login_{tag}@bench.local",
+            hashed_password=hash_password(PASSWORD),
+            is_active=True
+        )
+        db.add(user)
+        await db.commit()
+
+        try:
+            token = create_access_token(str(user.id))
+            async with websockets.connect(f"{ws_url}?token={token}") as ws:
+                idle = await ping_for(ws, args.seconds, interval)
+
+                stop = asyncio.Event()
+                storm = asyncio.create_task(login_storm(args.api, user.username, args.concurrency, stop))
+                started = time.perf_counter()
+                busy = await ping_for(ws, args.seconds, interval)
+                stop.set()
+                ok, limited, failed = await storm
+                elapsed = time.perf_counter() - started
+        finally:
+            await db.execute(delete(User).where(User.id == user.id))
+            await db.commit()
+
+    await engine.dispose()
+
+    total = ok + limited + failed
+    if total and limited * 2 > total:
+        sys.exit(
+            f"❌ {limited:,} of {total:,} logins were rate-limited (429) before reaching bcrypt; "
+            "restart the API with RATE_LIMIT_ENABLED=false and run again"
+        )
+
+    report("idle", idle)
+    report(f"login storm ({args.concurrency} clients)", busy)
+    print(f"\n🔐 {ok:,} logins ({ok / elapsed:.1f}/s), {limited:,} rate-limited, {failed:,} failed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+"""
+Benchmark OFFSET vs keyset pagination for conversation history
+
+Seeds one conversation with MESSAGE_COUNT messages (generate_series, so it is
+fast), then times a 50-row page at increasing scroll depths using the old
+OFFSET query and the (created_at, id) keyset query used by get_messages.
+Seeded rows are removed at the end.
+
+Run with: python scripts/bench_message_paging.py
+"""
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import asyncio
+import statistics
+import time
+import uuid
+
+from sqlalchemy import select, text, tuple_
+
+import app.models  # noqa: register all models
+from app.db.session import engine, async_session_maker
+from app.models.message import Message
+
+MESSAGE_COUNT = 1_000_000
+PAGE_SIZE = 50
+DEPTHS = [0, 10_000, 100_000, 500_000, 990_000]
+REPEAT = 5
+
+
+async def timed(db, stmt) -> float:
+    samples = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        await db.execute(stmt)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+async def main():
+    tag = uuid.uuid4().hex[:8]
+    user_id = uuid.uuid4()
+    conv_id = uuid.uuid4()
+
+    async with async_session_maker() as db:
+        print(f"🌱 Seeding {MESSAGE_COUNT:,} messages...")
+        await db.execute(text("""
+            INSERT INTO users (id, username, email, hashed_password)
+            VALUES (:uid, :username, :email, 'x')
+        """), {"uid": user_id, "username": f"bench_{tag}", "email": f"{tag}@bench.local"})
+        await db.execute(text("""
+            INSERT INTO conversations (id, kind, title, avatar_url, is_archived)
+            VALUES (:cid, 'group', 'bench', '', false)
+        """), {"cid": conv_id})
+        await db.execute(text("""
+            INSERT INTO messages (id, conversation_id, sender_id, message_type, text, is_deleted, created_at)
+            SELECT gen_random_uuid(), :cid, :uid, 'TEXT', 'bench message ' || n, false,
+                   now() - (n || ' milliseconds')::interval
+            FROM generate_series(1, :count) AS n
+        """), {"cid": conv_id, "uid": user_id, "count": MESSAGE_COUNT})
+        await db.commit()
+        await db.execute(text("ANALYZE messages"))
+
+        print(f"\n{'depth':>9} | {'offset ms':>10} | {'keyset ms':>10}")
+        print("-" * 36)
+        try:
+            base = (
+                select(Message)
+                .where(Message.conversation_id == conv_id)
+                .order_by(Message.created_at.desc(), Message.id.desc())
+            )
+            for depth in DEPTHS:
+                offset_ms = await timed(db, base.offset(depth).limit(PAGE_SIZE))
+
+                # The cursor a client would hold after scrolling to this depth
+                if depth:
+                    anchor = (await db.execute(
+                        select(Message.created_at, Message.id)
+                        .where(Message.conversation_id == conv_id)
+                        .order_by(Message.created_at.desc(), Message.id.desc())
+                        .offset(depth - 1)
+                        .limit(1)
+                    )).one()
+                    keyset = base.where(
+                        tuple_(Message.created_at, Message.id) < tuple_(anchor.created_at, anchor.id)
+                    )
+                else:
+                    keyset = base
+                keyset_ms = await timed(db, keyset.limit(PAGE_SIZE))
+
+                print(f"{depth:>9,} | {offset_ms:>10.2f} | {keyset_ms:>10.2f}")
+        finally:
+            await db.execute(text("DELETE FROM conversations WHERE id = :cid"), {"cid": conv_id})
+            await db.execute(text("DELETE FROM users WHERE id = :uid"), {"uid": user_id})
+            await db.commit()
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+"""
+Benchmark WebSocket send-to-deliver latency
+
+Seeds two throwaway users sharing a DM, connects both to a running API node,
+and times each message from the sender's ws.send() until the recipient's
+socket receives it. Messages are sent one at a time, so the numbers are
+per-message latency rather than throughput. Target: p50 < 2 ms on one node.
+
+Needs the API (uvicorn app.main:app), Postgres and Redis running; the worker
+can be stopped. Seeded rows are removed at the end.
+
+Run with:
+    python scripts/bench_send_latency.py --url ws://localhost:8000/api/v1/ws/chat --messages 2000
+"""
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import websockets
+from sqlalchemy import delete
+
+import app.models  # noqa: register all models
+from app.core.security import create_access_token
+from app.db.session import engine, async_session_maker
+from app.models.user import User
+from app.models.conversation import Conversation
+from app.models.conversation_member import ConversationMember
+
+
+def percentile(values: list[float], pct: float) -> float:
+    index = min(len(values) - 1, int(len(values) * pct / 100))
+    return values[index]
+
+
+async def wait_for(ws, event_type: str) -> dict:
+    while True:
+        data = json.loads(await ws.recv())
+        if data.get("type") == event_type:
+            return data
+
+
+async def run(url: str, messages: int, warmup: int, conv_id: uuid.UUID, sender: User, receiver: User) -> list[float]:
+    sender_url = f"{url}?token={create_access_token(str(sender.id))}"
+    receiver_url = f"{url}?token={create_access_token(str(receiver.id))}"
+    room_id = str(conv_id)
+
+    async with websockets.connect(sender_url) as tx, websockets.connect(receiver_url) as rx:
+        await tx.send(json.dumps({"type": "join", "roomId": room_id}))
+        await wait_for(tx, "joined")
+
+        latencies = []
+        for i in range(warmup + messages):
+            nonce = uuid.uuid4().hex
+            start = time.perf_counter()
+            await tx.send(json.dumps({"type": "message", "roomId": room_id, "text": nonce}))
+            while True:
+                data = json.loads(await rx.recv())
+                if data.get("type") == "message" and data.get("text") == nonce:
+                    break
+            if i >= warmup:
+                latencies.append((time.perf_counter() - start) * 1000)
+        return latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="WebSocket send-to-deliver latency")
+    parser.add_argument("--url", default="ws://localhost:8000/api/v1/ws/chat")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=50, help="untimed messages to fill caches")
+    args = parser.parse_args()
+
+    tag = uuid.uuid4().hex[:8]
+    async with async_session_maker() as db:
+        sender = User(username=f"bench_tx_{tag}", email=f"tx_{tag}@bench.local", hashed_password="x")
+        receiver = User(username=f"bench_rx_{tag}", email=f"rx_{tag}@bench.local", hashed_password="x")
+        db.add_all([sender, receiver])
+        await db.flush()
+        conv = Conversation(kind="dm", title=None)
+        db.add(conv)
+        await db.flush()
+        db.add_all([
+            ConversationMember(conversation_id=conv.id, user_id=sender.id),
+            ConversationMember(conversation_id=conv.id, user_id=receiver.id),
+        ])
+        await db.commit()
+
+        try:
+            latencies = sorted(await run(args.url, args.messages, args.warmup, conv.id, sender, receiver))
+        finally:
+            await db.execute(delete(Conversation).where(Conversation.id == conv.id))
+            await db.execute(delete(User).where(User.id.in_([sender.id, receiver.id])))
+            await db.commit()
+
+    await engine.dispose()
+
+    p50 = percentile(latencies, 50)
+    print(f"\n📊 {len(latencies):,} messages, send -> deliver")
+    print(f"   p50 = {p50:.2f} ms {'✅' if p50 < 2 else '⚠️ (target < 2 ms)'}")
+    print(f"   p90 = {percentile(latencies, 90):.2f} ms")
+    print(f"   p99 = {percentile(latencies, 99):.2f} ms")
+    print(f"   max = {latencies[-1]:.2f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+"""
+Load generator for message ingestion (Redis Streams XADD)
+
+Pushes synthetic chat messages through RedisStreams.add_message at a target
+rate, spread over many conversations (and therefore over all STREAM_SHARDS),
+and reports achieved throughput plus XADD latency percentiles.
+
+Run with:
+    python scripts/loadgen_streams.py --rate 50000 --duration 30 --procs 8
+
+Compare the default STREAM_SHARDS=1 against e.g. STREAM_SHARDS=8 to see the
+hot-key effect.
+Generated entries are real stream entries; run it against a scratch Redis or
+stop the worker and trim the shards afterwards.
+"""
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import asyncio
+import multiprocessing
+import time
+import uuid
+from datetime import datetime, timezone
+
+from app.config.settings import settings
+from app.websocket.streams import RedisStreams, shard_keys
+
+
+async def produce(rate: float, duration: float, concurrency: int, conversations: list[str]) -> list[float]:
+    streams = RedisStreams()
+    latencies: list[float] = []
+    interval = concurrency / rate  # seconds between sends for each task
+    sender_id = str(uuid.uuid4())
+    deadline = time.perf_counter() + duration
+
+    async def sender(task_index: int):
+        next_send = time.perf_counter() + interval * task_index / concurrency
+        i = task_index
+        while next_send < deadline:
+            delay = next_send - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            payload = {
+                "messageId": str(uuid.uuid4()),
+                "conversationId": conversations[i % len(conversations)],
+                "senderId": sender_id,
+                "text": "load test message",
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+            }
+            start = time.perf_counter()
+            await streams.add_message(payload)
+            latencies.append((time.perf_counter() - start) * 1000)
+            next_send += interval
+            i += concurrency
+
+    await asyncio.gather(*(sender(i) for i in range(concurrency)))
+    await streams.close()
+    return latencies
+
+
+def run_process(args) -> list[float]:
+    rate, duration, concurrency, conversations = args
+    return asyncio.run(produce(rate, duration, concurrency, conversations))
+
+
+def percentile(values: list[float], pct: float) -> float:
+    index = min(len(values) - 1, int(len(values) * pct / 100))
+    return values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="XADD load generator")
+    parser.add_argument("--rate", type=float, default=50000, help="total messages per second")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--procs", type=int, default=8, help="producer processes")
+    parser.add_argument("--concurrency", type=int, default=64, help="in-flight XADDs per process")
+    parser.add_argument("--conversations", type=int, default=10000)
+    args = parser.parse_args()
+
+    conversations = [str(uuid.uuid4()) for _ in range(args.conversations)]
+    print(f"🚀 {args.rate:,.0f} msg/s for {args.duration}s across {settings.STREAM_SHARDS} shard(s): {shard_keys()[:4]}...")
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(args.procs) as pool:
+        results = pool.map(
+            run_process,
+            [(args.rate / args.procs, args.duration, args.concurrency, conversations)] * args.procs
+        )
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(lat for result in results for lat in result)
+    if not latencies:
+        print("⚠️ No messages sent")
+        return
+
+    print(f"\n📊 Sent {len(latencies):,} messages in {elapsed:.1f}s ({len(latencies) / elapsed:,.0f} msg/s)")
+    print(f"   XADD p50 = {percentile(latencies, 50):.2f} ms")
+    print(f"   XADD p99 = {percentile(latencies, 99):.2f} ms")
+    print(f"   XADD max = {latencies[-1]:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
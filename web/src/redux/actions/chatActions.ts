@@ -110,6 +110,9 @@ export const fetchMessages = (conversationId: string) => async (dispatch: AppDis
         mediaType: msg.media_type,
       }));
 
+      // API pages newest first; the chat window renders oldest first
+      messages.reverse();
+
       dispatch(setMessages({ conversationId, messages }));
     }
   } catch (error: any) {
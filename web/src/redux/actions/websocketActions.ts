@@ -9,6 +9,7 @@ import {
   addOnlineUser,
   removeOnlineUser,
   setTyping,
+  setRoomTyping,
   resetWebSocket
 } from '../slices/websocketSlice';
 import {
@@ -248,7 +249,9 @@ function setupWebSocketListeners(dispatch: AppDispatch) {
 
   // Typing indicator
   wsService.on('typing', (data) => {
-    if (data.roomId && data.userId) {
+    if (data.roomId && data.userIds) {
+      dispatch(setRoomTyping({ conversationId: data.roomId, userIds: data.userIds }));
+    } else if (data.roomId && data.userId) {
       dispatch(setTyping({
         conversationId: data.roomId,
         userId: data.userId,
@@ -296,6 +299,18 @@ function setupWebSocketListeners(dispatch: AppDispatch) {
     }
   });
 
+  // Batched presence diff for users we share a conversation with
+  wsService.on('presence', (data) => {
+    (data.online || []).forEach((userId) => {
+      dispatch(addOnlineUser(userId));
+      dispatch(updateUserOnlineStatus({ userId, isOnline: true }));
+    });
+    (data.offline || []).forEach((userId) => {
+      dispatch(removeOnlineUser(userId));
+      dispatch(updateUserOnlineStatus({ userId, isOnline: false }));
+    });
+  });
+
   // Joined conversation
   wsService.on('joined', (data) => {
     console.log('✅ Joined conversation:', data.roomId);
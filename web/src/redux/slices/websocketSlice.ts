@@ -73,6 +73,11 @@ const websocketSlice = createSlice({
       }
     },
 
+    // Replace everyone typing in a conversation (merged server frames)
+    setRoomTyping: (state, action: PayloadAction<{ conversationId: string; userIds: string[] }>) => {
+      state.typingUsers[action.payload.conversationId] = action.payload.userIds;
+    },
+
     // Clear all typing for a conversation
     clearTyping: (state, action: PayloadAction<string>) => {
       delete state.typingUsers[action.payload];
@@ -97,6 +102,7 @@ export const {
   removeOnlineUser,
   setOnlineUsers,
   setTyping,
+  setRoomTyping,
   clearTyping,
   resetWebSocket
 } = websocketSlice.actions;
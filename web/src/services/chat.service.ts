@@ -24,13 +24,14 @@ class ChatService {
   }
 
   /**
-   * Get messages for a conversation
+   * Get messages for a conversation (newest first).
+   * Pass `paging.before` from a previous response to load older messages.
    */
-  async getMessages(conversationId: string, limit = 50, offset = 0) {
+  async getMessages(conversationId: string, limit = 50, before?: string) {
     const response = await axios.get(
       `${API_URL}/conversations/${conversationId}/messages`,
       {
-        params: { limit, offset },
+        params: { limit, before },
         headers: getAuthHeader(),
       }
     );
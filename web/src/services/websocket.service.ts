@@ -16,7 +16,7 @@ export interface Message {
 }
 
 export interface WebSocketEvent {
-  type: 'message' | 'typing' | 'read' | 'joined' | 'left' | 'online' | 'offline' | 'error';
+  type: 'message' | 'typing' | 'read' | 'joined' | 'left' | 'online' | 'offline' | 'presence' | 'ping' | 'error';
   roomId?: string;
   userId?: string;
   messageId?: string;
@@ -27,6 +27,9 @@ export interface WebSocketEvent {
   isTyping?: boolean;
   lastMessageId?: string;
   message?: string;
+  userIds?: string[];
+  online?: string[];
+  offline?: string[];
 }
 
 type EventCallback = (event: WebSocketEvent) => void;
@@ -279,6 +282,12 @@ class WebSocketService {
   private handleMessage(data: WebSocketEvent) {
     // console.log('📨 Received:', data.type, data);
 
+    // Answer server heartbeats so the server doesn't reap an idle connection
+    if (data.type === 'ping') {
+      this.ws?.send(JSON.stringify({ type: 'pong' }));
+      return;
+    }
+
     // Emit specific event type
     this.emit(data.type, data);
 